@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+"""Imports main.py in an isolated working directory for benchmarks.
+
+main.py resolves its JSON stores and exports relative to the current directory,
+so benchmarks switch to a temporary directory first to keep the repository untouched.
+"""
+import os
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_main(workdir: str | None = None):
+    """Returns the imported main module with cwd switched to an isolated directory."""
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    os.environ.setdefault("ENABLE_WEB_SERVER", "0")
+    os.chdir(workdir or tempfile.mkdtemp(prefix="cxner-bench-"))
+    import main  # noqa: E402
+
+    return main
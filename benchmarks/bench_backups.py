@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""Backups on a 100k-release DB: raw JSON uploads vs BackupManager full and delta archives.
+
+Запуск: python benchmarks/bench_backups.py [--releases 100000] [--changed 0.01] [--codec auto]
+
+«before» — прежние /backup и /moderation_backup: releases.json и moderation_releases.json
+с отступами целиком, файл читается прямо в цикле (InputFile внутри send_document).
+«after» — BACKUPS.backup(): полный архив всех хранилищ (zstd, если установлен zstandard,
+иначе gzip), затем дельта после правки --changed доли релизов. Для каждого шага — время,
+размер и самая длинная пауза цикла событий (тикер раз в 5 мс). Проверяется: load() дельты
+собирает те же хранилища, что лежат на диске, /backup отправляет дельту вместе с её полным
+архивом, ротация оставляет --keep-full полных архивов и дельты к ним.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import tempfile
+import time
+
+import datagen
+import tg_stubs
+from _bootstrap import import_main
+
+workdir = tempfile.mkdtemp(prefix="cxner-bench-backups-")
+main = import_main(workdir)
+
+
+class LoopStalls:
+    """Longest gap between ticks of a 5 ms ticker while the block runs."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.worst = 0.0
+
+    async def _tick(self):
+        last = time.perf_counter()
+        while True:
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            self.worst = max(self.worst, now - last - self.interval)
+            last = now
+
+    @contextlib.asynccontextmanager
+    async def watch(self):
+        task = asyncio.ensure_future(self._tick())
+        await asyncio.sleep(0)
+        try:
+            yield self
+            # последний тик после блока — иначе хвостовая пауза не попадёт в замер
+            await asyncio.sleep(self.interval * 2)
+        finally:
+            task.cancel()
+
+
+async def legacy_backup() -> dict:
+    """The old /backup + /moderation_backup: raw files read synchronously on the loop."""
+    sizes = 0
+    async with LoopStalls().watch() as stalls:
+        t0 = time.perf_counter()
+        for path in (main.DB_FILE, main.MODERATION_DB_FILE):
+            with open(path, "rb") as f:
+                sizes += len(f.read())
+            await asyncio.sleep(0)
+        elapsed = time.perf_counter() - t0
+    return {"seconds": elapsed, "bytes": sizes, "stall_ms": stalls.worst * 1000}
+
+
+async def timed_backup(manager, **kwargs) -> dict:
+    async with LoopStalls().watch() as stalls:
+        t0 = time.perf_counter()
+        path = await manager.backup(**kwargs)
+        elapsed = time.perf_counter() - t0
+    return {"seconds": elapsed, "bytes": os.path.getsize(path), "stall_ms": stalls.worst * 1000, "path": path, "manifest": manager.last}
+
+
+def mutate(data: dict, share: float, seed: int) -> int:
+    """Moderates share of the releases, deletes one artist and adds one, like a busy day."""
+    rnd = random.Random(seed)
+    db, messages, history = data["db"], data["moderation_db"]["moderation_messages"], data["history"]
+    uids = list(db)
+    changed = 0
+    target = int(sum(len(r) for r in db.values()) * share)
+    while changed < target:
+        uid = rnd.choice(uids)
+        idx = rnd.randrange(len(db[uid]))
+        rel = db[uid][idx]
+        rel["status"] = "approved"
+        rel["moderator"] = "mod_bench"
+        rel["moderation_time"] = "2025-02-01T12:00:00"
+        history.setdefault(f"{uid}_{idx}", []).append({"timestamp": "2025-02-01T12:00:00", "old_status": "on_upload", "new_status": "approved", "moderator_id": 1, "moderator_name": "mod_bench", "reason": None})
+        messages[rnd.randrange(len(messages))]["status"] = "approved"
+        changed += 1
+    db.pop(uids[-1])
+    db["999999999"] = [dict(db[uids[0]][0], name="Fresh release")]
+    return changed
+
+
+def write_stores(data: dict) -> None:
+    for path, obj in ((main.DB_FILE, data["db"]), (main.MODERATION_DB_FILE, data["moderation_db"]),
+                      (main.HISTORY_FILE, data["history"]), (main.CABINET_USERS_FILE, data["cabinet_users"])):
+        main._atomic_write_json(path, obj)
+
+
+async def send_backup(manager) -> list:
+    main.BACKUPS = manager
+    bot = tg_stubs.StubBot()
+    update = tg_stubs.message_update(bot, main.ADMIN_IDS[0], text="/backup")
+    with contextlib.redirect_stdout(io.StringIO()):
+        await main.send_database_backup_to_admin(update, tg_stubs.context(bot))
+    return [kw["filename"] for method, kw in bot.calls if method == "sendDocument"]
+
+
+def main_cli():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--releases", type=int, default=100_000)
+    ap.add_argument("--changed", type=float, default=0.01, help="share of releases moderated between the full and the delta")
+    ap.add_argument("--codec", default="auto", choices=("auto", "zstd", "gzip"))
+    ap.add_argument("--keep-full", type=int, default=2)
+    ap.add_argument("--seed", type=int, default=1234)
+    args = ap.parse_args()
+
+    data = datagen.generate(args.releases, args.seed)
+    datagen.write(workdir, data, main)
+    for n in range(200):
+        main.OUTBOX.enqueue(100000000 + n, f"notice {n}", f"bench:{n}")
+    manager = main.BackupManager(os.path.join(workdir, "backups"), 0, 24 * 3600, args.keep_full, args.codec)
+
+    before = asyncio.run(legacy_backup())
+    with contextlib.redirect_stdout(io.StringIO()):
+        full = asyncio.run(timed_backup(manager))
+        changed = mutate(data, args.changed, args.seed)
+        write_stores(data)
+        delta = asyncio.run(timed_backup(manager))
+        skipped = asyncio.run(timed_backup(manager))
+
+    raw = sum(info.get("bytes", 0) for info in full["manifest"]["stores"].values())
+    print(f"releases={args.releases} changed={changed} codec={manager.codec} stores on disk={raw / 1048576:.1f} MB")
+    print(f"{'':<22}{'seconds':>9}{'MB':>9}{'loop stall ms':>15}")
+    rows = (
+        ("before (2 raw JSON)", before),
+        ("after full", full),
+        ("after delta", delta),
+        ("after unchanged", skipped),
+    )
+    for name, r in rows:
+        print(f"{name:<22}{r['seconds']:>9.2f}{r['bytes'] / 1048576:>9.2f}{r['stall_ms']:>15.1f}")
+    stores = delta["manifest"]["stores"]
+    print("delta: " + ", ".join(
+        f"{store} {info['changed']}+{info['deleted']}" if info["mode"] == "delta" else f"{store} {info['mode']}"
+        for store, info in stores.items()
+    ))
+    assert skipped["path"] == delta["path"], "unchanged stores produced a new archive"
+
+    loaded = manager.load(delta["path"])
+    for store, path, _ in main.BackupManager.JSON_STORES:
+        with open(path, encoding="utf-8") as f:
+            assert loaded[store] == json.load(f), f"{store} differs after load()"
+    print("load(): delta + full rebuild every JSON store as on disk")
+
+    sent = asyncio.run(send_backup(manager))
+    assert sent == [os.path.basename(p) for p in manager.chain(delta["path"])], sent
+    print(f"/backup sent: {', '.join(sent)}")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(args.keep_full):
+            asyncio.run(timed_backup(manager, kind="full"))
+    kinds = [kind for _, kind, _ in manager.archives()]
+    assert kinds == ["full"] * args.keep_full, kinds
+    print(f"rotation: keep_full={args.keep_full} -> {len(kinds)} archives left, the first full and its delta removed")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""Bulk moderation: per-card status changes vs one transactional write, plus the rate-limited fan-out.
+
+Запуск: python benchmarks/bench_bulk_moderation.py [--releases 5000] [--batch 10 50 100]
+
+«before» — то, что делает один клик по карточке, повторённое для каждого релиза пачки:
+add_history_entry() (чтение и запись history.json), save_db(), update_moderation_record()
+(чтение и запись moderation_releases.json). «after» — apply_bulk_moderation(): те же три
+файла пишутся по одному разу. Итоговые releases.json, history.json и moderation_releases.json
+сверяются между путями. Отдельно прогоняется run_bulk_fanout() на заглушке Bot API: интервал
+между правками в чате модерации, общий темп и повтор после RetryAfter. Уведомления артистам
+идут через outbox и меряются в bench_outbox.py.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+
+import datagen
+import tg_stubs
+from _bootstrap import import_main
+
+workdir = tempfile.mkdtemp(prefix="cxner-bench-bulk-")
+main = import_main(workdir)
+
+MODERATOR_ID = 881379104
+MODERATOR = "mod_bench"
+
+
+def reset(data: dict) -> None:
+    datagen.write(workdir, data, main)
+    main.db.clear()
+    main.db.update(json.loads(json.dumps(data["db"])))
+    main._mark_all_releases_changed()
+
+
+def pick(count: int, seed: int) -> list:
+    rnd = random.Random(seed)
+    pool = [
+        (uid, idx) for uid, rels in main.db.items() for idx, rel in enumerate(rels)
+        if rel.get("status") not in (main.STATUS_APPROVED, main.STATUS_DELETED) and not rel.get("user_deleted")
+    ]
+    return rnd.sample(pool, count)
+
+
+def legacy(keys: list) -> None:
+    # тело _mod_approve без Telegram-вызовов, по разу на релиз
+    for user_id, idx in keys:
+        release = main.db[user_id][idx]
+        old_status = release.get("status")
+        release["status"] = main.STATUS_APPROVED
+        release["moderator"] = MODERATOR
+        release["moderation_time"] = main.datetime.now().isoformat()
+        main.add_history_entry(user_id, idx, old_status, main.STATUS_APPROVED, MODERATOR_ID, MODERATOR)
+        main._mark_release_changed(user_id, idx)
+        main.save_db(main.db)
+        main.update_moderation_record(user_id, idx, release)
+
+
+def bulk(keys: list) -> None:
+    changed, skipped = asyncio.run(main.apply_bulk_moderation(keys, main.STATUS_APPROVED, MODERATOR_ID, MODERATOR))
+    assert len(changed) == len(keys) and not skipped, skipped
+
+
+def snapshot() -> tuple:
+    """Stores on disk with the timestamps stripped, so both paths compare equal."""
+    def load(path):
+        with open(os.path.join(workdir, path), encoding="utf-8") as f:
+            return json.load(f)
+
+    releases = load(main.DB_FILE)
+    for rels in releases.values():
+        for rel in rels:
+            rel.pop("moderation_time", None)
+    history = {k: [{**e, "timestamp": None} for e in v] for k, v in load(main.HISTORY_FILE).items()}
+    messages = [{**m, "moderation_time": None} for m in load(main.MODERATION_DB_FILE)["moderation_messages"]]
+    return releases, history, messages
+
+
+def timed(fn, *args) -> float:
+    t0 = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - t0
+
+
+class FloodBot(tg_stubs.StubBot):
+    """Records call times and answers the first call to one chat with RetryAfter."""
+
+    def __init__(self, flood_chat: int, retry_after: float):
+        super().__init__()
+        self.times: list[tuple[int, float]] = []
+        self.flood_chat = flood_chat
+        self.retry_after = retry_after
+
+    def _record(self, method: str, **kwargs):
+        chat_id = kwargs.get("chat_id")
+        if chat_id == self.flood_chat and self.retry_after:
+            retry, self.retry_after = self.retry_after, 0
+            raise main.RetryAfter(retry)
+        self.times.append((chat_id, time.monotonic()))
+        return super()._record(method, **kwargs)
+
+    async def send_message(self, chat_id=None, text=None, **kwargs):
+        return self._record("sendMessage", chat_id=chat_id, text=text, **kwargs)
+
+
+def check_fanout(keys: list, per_second: int, chat_interval: float) -> dict:
+    for user_id, idx in keys:
+        main.db[user_id][idx]["moderation_original_text"] = f"<b>{user_id}_{idx}</b>"
+    changed = [(user_id, idx, main.STATUS_ON_UPLOAD) for user_id, idx in keys]
+    bot = FloodBot(main.MODERATION_CHAT_ID, retry_after=1)
+    main.BULK_FANOUT = main.FanoutLimiter(per_second, chat_interval)
+    jobs = main._bulk_fanout_jobs(bot, changed, main.STATUS_APPROVED)
+    reports = []
+
+    async def progress(sent, failed, total):
+        reports.append((sent, failed, total))
+
+    t0 = time.monotonic()
+    sent, failed = asyncio.run(main.run_bulk_fanout(jobs, progress))
+    elapsed = time.monotonic() - t0
+
+    assert (sent, failed) == (len(jobs), 0), (sent, failed)
+    assert reports[-1] == (len(jobs), 0, len(jobs)), reports[-1]
+    edits = [t for chat, t in bot.times if chat == main.MODERATION_CHAT_ID]
+    assert len(edits) == len(keys)
+    gaps = [b - a for a, b in zip(edits, edits[1:])]
+    assert min(gaps) >= chat_interval * 0.95, min(gaps)
+    all_times = sorted(t for _, t in bot.times)
+    window = max(sum(1 for t in all_times if start <= t < start + 1.0) for start in all_times)
+    assert window <= per_second + 1, window
+    return {"jobs": len(jobs), "elapsed_s": elapsed, "min_edit_gap_ms": min(gaps) * 1000, "max_per_second": window}
+
+
+def main_cli():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--releases", type=int, default=5000)
+    ap.add_argument("--batch", type=int, nargs="+", default=[10, 50, 100])
+    ap.add_argument("--seed", type=int, default=1234)
+    args = ap.parse_args()
+
+    data = datagen.generate(args.releases, args.seed)
+    print(f"releases={args.releases}")
+    print(f"{'batch':>6}{'per-card ms':>13}{'bulk ms':>10}{'speedup':>10}")
+    for size in args.batch:
+        reset(data)
+        keys = pick(size, args.seed + size)
+        before = timed(legacy, keys)
+        expected = snapshot()
+        reset(data)
+        after = timed(bulk, keys)
+        assert snapshot() == expected, "bulk result differs from per-card moderation"
+        print(f"{size:>6}{before * 1000:>13.1f}{after * 1000:>10.1f}{before / after:>9.1f}x")
+
+    # повторный bulk того же набора ничего не пишет: всё уже в статусе
+    changed, skipped = asyncio.run(main.apply_bulk_moderation(keys, main.STATUS_APPROVED, MODERATOR_ID, MODERATOR))
+    assert not changed and all(reason == "unchanged" for *_, reason in skipped)
+
+    # откат: если releases.json не записался, в памяти статусы прежние
+    reset(data)
+    keys = pick(5, args.seed)
+    statuses = [main.db[u][i].get("status") for u, i in keys]
+    real_save_db = main.save_db
+
+    def broken_save_db(db_obj):
+        raise OSError("disk full")
+
+    main.save_db = broken_save_db
+    try:
+        asyncio.run(main.apply_bulk_moderation(keys, main.STATUS_APPROVED, MODERATOR_ID, MODERATOR))
+        raise AssertionError("save_db failure was swallowed")
+    except OSError:
+        pass
+    finally:
+        main.save_db = real_save_db
+    assert [main.db[u][i].get("status") for u, i in keys] == statuses, "rollback left mutated releases"
+
+    fan = check_fanout(pick(20, args.seed), per_second=40, chat_interval=0.05)
+    print(
+        f"fan-out: {fan['jobs']} calls in {fan['elapsed_s']:.2f} s, min card edit gap {fan['min_edit_gap_ms']:.0f} ms, "
+        f"max {fan['max_per_second']} calls/s, RetryAfter retried"
+    )
+    print("OK: stores match per-card moderation, rollback and fan-out limits hold")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""Page flip in the artist cabinet (/my, card_N): legacy full rebuild vs cached summary and cards.
+
+Запуск: python benchmarks/bench_cabinet.py [--releases 50 500 2000] [--flips 2000]
+
+«before» — копия прежнего расчёта my_cmd: список видимых релизов, пять проходов подсчёта
+статусов, releases.index(rel) для исходного индекса и рендер карточки на каждый клик.
+«after» — _cabinet_summary() + _cabinet_card() + _cabinet_keyboard() из main.py: сводка
+пересчитывается только после мутации релизов пользователя, карточка — после мутации релиза.
+"""
+import argparse
+import random
+import time
+
+import datagen
+from _bootstrap import import_main
+
+main = import_main()
+
+USER_ID = "777000111"
+
+
+def legacy_page(releases: list, page: int):
+    visible_releases = [r for r in releases if not r.get('user_deleted', False)]
+    total = len(visible_releases)
+    on_upload = sum(1 for r in visible_releases if r.get('status') == main.STATUS_ON_UPLOAD)
+    moderation = sum(1 for r in visible_releases if r.get('status') == main.STATUS_MODERATION)
+    approved = sum(1 for r in visible_releases if r.get('status') == main.STATUS_APPROVED)
+    rejected = sum(1 for r in visible_releases if r.get('status') == main.STATUS_REJECTED)
+    needs_fix = sum(1 for r in visible_releases if r.get('status') == main.STATUS_NEEDS_FIX)
+    approved_pct = (approved * 100 / total) if total > 0 else 0
+    header = (
+        f"МОЙ КАБИНЕТ • {total} релизов\n✅ Одобрено: {approved} ({approved_pct:.0f}%)\n"
+        f"⏳ На отгрузке: {on_upload}\n🧠 На модерации: {moderation}\n⚠️ На правках: {needs_fix}\n❌ Отклонено: {rejected}"
+    )
+    page = max(0, min(page, total - 1))
+    rel = visible_releases[page]
+    text = header + "\n\n"
+    text += f"<b>🎵 {main.escape_html(rel.get('name', 'Релиз'))}</b>\n"
+    text += f"📝 Тип: <i>{main.escape_html(rel.get('type', 'Релиз'))}</i>\n"
+    text += f"📅 Дата: <i>{main.escape_html(rel.get('date', '—'))}</i>\n"
+    text += f"👤 Артист: <i>{main.escape_html(rel.get('nick', '—'))}</i>\n"
+    text += f"🏷️ Жанр: <i>{main.escape_html(rel.get('genre', '—'))}</i>\n"
+    text += f"\n<b>Карточка {page + 1} из {total}</b>"
+    original_idx = releases.index(rel)
+    keyboard = main.InlineKeyboardMarkup([
+        [main.InlineKeyboardButton("⬅️", callback_data=f"card_{page - 1}"), main.InlineKeyboardButton("➡️", callback_data=f"card_{page + 1}")],
+        [main.InlineKeyboardButton("📄", callback_data=f"release_details_{USER_ID}_{original_idx}")],
+    ])
+    return text, keyboard, original_idx
+
+
+def cached_page(page: int):
+    summary = main._cabinet_summary(USER_ID)
+    total = len(summary.visible)
+    page = max(0, min(page, total - 1))
+    idx = summary.visible[page]
+    text = summary.header + "\n\n" + main._cabinet_card(USER_ID, idx, main.db[USER_ID][idx])
+    text += f"\n<b>Карточка {page + 1} из {total}</b>"
+    return text, main._cabinet_keyboard(USER_ID, idx, page, total), idx
+
+
+def make_releases(count: int, seed: int) -> list:
+    rnd = random.Random(seed)
+    pool = [r for rels in datagen.generate(count, seed)["db"].values() for r in rels][:count]
+    for rel in pool:
+        rel["user_deleted"] = rnd.random() < 0.1
+    return pool
+
+
+def run(count: int, flips: int, seed: int) -> tuple[float, float]:
+    main.db.clear()
+    main.db[USER_ID] = make_releases(count, seed)
+    main._mark_all_releases_changed()
+    releases = main.db[USER_ID]
+    rnd = random.Random(seed)
+    pages = [rnd.randrange(count) for _ in range(flips)]
+
+    # сверка индексов: карточка N указывает на тот же релиз, что и прежний releases.index()
+    for page in pages[:200]:
+        assert legacy_page(releases, page)[2] == cached_page(page)[2]
+
+    t0 = time.perf_counter()
+    for page in pages:
+        legacy_page(releases, page)
+    before = (time.perf_counter() - t0) / flips
+
+    t0 = time.perf_counter()
+    for page in pages:
+        cached_page(page)
+    after = (time.perf_counter() - t0) / flips
+
+    # мутация одного релиза пересобирает сводку и его карточку, но не остальные
+    idx = main._cabinet_summary(USER_ID).visible[0]
+    old_header = main._cabinet_summary(USER_ID).header
+    old_card = main._cabinet_card(USER_ID, idx, releases[idx])
+    releases[idx]["status"] = main.STATUS_NEEDS_FIX if releases[idx].get("status") != main.STATUS_NEEDS_FIX else main.STATUS_APPROVED
+    main._mark_release_changed(USER_ID, idx)
+    assert main._cabinet_summary(USER_ID).header != old_header
+    assert main._cabinet_card(USER_ID, idx, releases[idx]) != old_card
+    return before, after
+
+
+def main_cli():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--releases", type=int, nargs="+", default=[50, 500, 2000])
+    ap.add_argument("--flips", type=int, default=2000)
+    ap.add_argument("--seed", type=int, default=1234)
+    args = ap.parse_args()
+
+    print(f"{'releases':>9}{'before, us':>13}{'after, us':>12}{'speedup':>10}")
+    for count in args.releases:
+        before, after = run(count, args.flips, args.seed)
+        print(f"{count:>9}{before * 1e6:>13.1f}{after * 1e6:>12.2f}{before / after:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""Callback acknowledgement and deferred heavy renders: inline handler vs deferred=True routes.
+
+Запуск: python benchmarks/bench_callback_ack.py [--releases 20000] [--bursts 20] [--latency-ms 80]
+
+Модератор в чате модерации щёлкает «Неделя → Месяц → Всё время» (stats_period_*) по одному
+сообщению быстрее, чем успевает прийти ответ Bot API. Апдейты идут через
+UserSerializedUpdateProcessor, как в боте. «before» — маршруты рендерят прямо в хендлере
+(deferred=False): клики одного модератора выстраиваются в очередь, и в сообщение по очереди
+ложатся все три экрана. «after» — deferred=True: тост «загрузка», рендер фоновой задачей,
+устаревший рендер отменяется. Проверяется, что в сообщении остаётся экран последнего клика.
+Отдельно: при зависшем answerCallbackQuery хендлер продолжает работу через CALLBACK_ACK_BUDGET_MS.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import tempfile
+import time
+from types import SimpleNamespace
+
+import datagen
+import tg_stubs
+from _bootstrap import import_main
+
+workdir = tempfile.mkdtemp(prefix="cxner-bench-callback-ack-")
+main = import_main(workdir)
+
+PERIODS = ("week", "month", "all")
+# по одному callback_data на каждый тяжёлый маршрут
+HEAVY_SAMPLES = ("stats_period_week", "release_details_1_0", "admin_stats_page_0")
+MODERATOR_BASE_ID = 500000000
+
+
+class SlowQuery(tg_stubs.StubCallbackQuery):
+    """Callback query whose answer and message edits take a Bot API round trip."""
+
+    def __init__(self, bot, data, user_id, chat_id, message_id, latency: float, answer_latency: float):
+        super().__init__(bot, data, user_id, chat_id)
+        self.message.message_id = message_id
+        self.latency = latency
+        self.answer_latency = answer_latency
+        self.answered_at = None
+
+    async def answer(self, text=None, show_alert=False, **kwargs):
+        await asyncio.sleep(self.answer_latency)
+        self.answered_at = time.perf_counter()
+        return await super().answer(text=text, show_alert=show_alert)
+
+    async def edit_message_text(self, text, **kwargs):
+        await asyncio.sleep(self.latency)
+        return await super().edit_message_text(text, **kwargs)
+
+
+def click(bot, data: str, user_id: int, message_id: int, latency: float, answer_latency: float = None):
+    query = SlowQuery(bot, data, user_id, main.MODERATION_CHAT_ID, message_id, latency, latency if answer_latency is None else answer_latency)
+    return SimpleNamespace(
+        message=None,
+        callback_query=query,
+        effective_user=query.from_user,
+        effective_chat=query.message.chat,
+        effective_message=query.message,
+    )
+
+
+def set_deferred(flag: bool) -> None:
+    for data in HEAVY_SAMPLES:
+        route, _ = main.CALLBACK_ROUTER.resolve(data)
+        route.deferred = flag
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+async def render_reference() -> str:
+    """Text of the "all time" screen rendered inline, to compare the final message against."""
+    set_deferred(False)
+    bot = tg_stubs.StubBot()
+    with contextlib.redirect_stdout(io.StringIO()):
+        await main.CALLBACK_ROUTER.dispatch(click(bot, "stats_period_all", MODERATOR_BASE_ID, 1, 0.0), tg_stubs.context(bot))
+    return next(kw["text"] for method, kw in bot.calls if method == "editMessageText")
+
+
+async def run_bursts(args, deferred: bool, reference: str) -> dict:
+    set_deferred(deferred)
+    bot = tg_stubs.StubBot()
+    app = tg_stubs.StubApplication()
+    processor = main.UserSerializedUpdateProcessor(32)
+    latency = args.latency_ms / 1000
+    acks, returns, t_start = [], [], time.perf_counter()
+    message_ids = []
+
+    async def burst(n: int) -> None:
+        moderator = MODERATOR_BASE_ID + n
+        message_id = 10_000_000 + n
+        message_ids.append(message_id)
+        pending = []
+        for period in PERIODS:
+            update = click(bot, f"stats_period_{period}", moderator, message_id, latency)
+
+            async def one(update=update, t0=time.perf_counter()):
+                await processor.process_update(update, main.CALLBACK_ROUTER.dispatch(update, tg_stubs.context(bot, application=app)))
+                returns.append(time.perf_counter() - t0)
+                acks.append(update.callback_query.answered_at - t0)
+
+            pending.append(asyncio.ensure_future(one()))
+            await asyncio.sleep(args.gap_ms / 1000)
+        await asyncio.gather(*pending)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        await asyncio.gather(*(burst(n) for n in range(args.bursts)))
+        await app.drain()
+    elapsed = time.perf_counter() - t_start
+
+    last_text = {}
+    edits = 0
+    for method, kwargs in bot.calls:
+        if method == "editMessageText" and kwargs.get("message_id") in message_ids:
+            edits += 1
+            last_text[kwargs["message_id"]] = kwargs.get("text") or ""
+    # последний клик каждой серии — «Всё время»: в сообщении должен остаться его экран
+    stale = sum(1 for mid in message_ids if last_text.get(mid) != reference)
+    return {"acks": acks, "returns": returns, "edits": edits, "stale": stale, "elapsed_s": elapsed}
+
+
+async def hung_ack(budget_s: float) -> float:
+    set_deferred(True)
+    bot = tg_stubs.StubBot()
+    app = tg_stubs.StubApplication()
+    update = click(bot, "stats_period_week", MODERATOR_BASE_ID, 20_000_000, 0.0, answer_latency=budget_s * 8)
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        await main.CALLBACK_ROUTER.dispatch(update, tg_stubs.context(bot, application=app))
+        returned = time.perf_counter() - t0
+        await app.drain()
+        await asyncio.sleep(budget_s * 8)
+    assert update.callback_query.answered_at is not None, "late ack was dropped"
+    return returned
+
+
+def main_cli():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--releases", type=int, default=20000)
+    ap.add_argument("--bursts", type=int, default=20, help="moderators, each clicking Week -> Month -> All time on one message")
+    ap.add_argument("--gap-ms", type=float, default=30, help="pause between clicks inside a series")
+    ap.add_argument("--latency-ms", type=float, default=80, help="Bot API round trip for answer and edit")
+    ap.add_argument("--seed", type=int, default=1234)
+    args = ap.parse_args()
+
+    datagen.write(workdir, datagen.generate(args.releases, args.seed), main)
+    main.load_stores()
+
+    print(f"releases={args.releases} moderators={args.bursts} gap={args.gap_ms:.0f} ms latency={args.latency_ms:.0f} ms")
+    print(f"{'':<8}{'ack p50':>9}{'ack p95':>9}{'ret p50':>9}{'ret p95':>9}{'edits':>7}{'stale':>7}{'total s':>9}")
+    reference = asyncio.run(render_reference())
+    for name, deferred in (("before", False), ("after", True)):
+        r = asyncio.run(run_bursts(args, deferred, reference))
+        print(
+            f"{name:<8}{percentile(r['acks'], 0.5) * 1000:>9.1f}{percentile(r['acks'], 0.95) * 1000:>9.1f}"
+            f"{percentile(r['returns'], 0.5) * 1000:>9.1f}{percentile(r['returns'], 0.95) * 1000:>9.1f}"
+            f"{r['edits']:>7}{r['stale']:>7}{r['elapsed_s']:>9.2f}"
+        )
+        if deferred:
+            assert r["stale"] == 0, f"{r['stale']} messages show a superseded screen"
+    cancelled = main.METRICS.counter("bot_callback_deferred_total", route="stats_period_{period}", result="cancelled").value
+    print(f"after: {cancelled:.0f} superseded renders cancelled")
+
+    budget = main.CALLBACK_ACK_BUDGET_MS / 1000
+    returned = asyncio.run(hung_ack(budget))
+    assert returned < budget * 2, returned
+    print(f"hung answerCallbackQuery ({budget * 8 * 1000:.0f} ms): dispatch returned in {returned * 1000:.0f} ms, ack delivered later")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""Moderation card edits under click bursts: direct Bot API edits vs ModerationCardEditor.
+
+Запуск: python benchmarks/bench_card_edits.py [--cards 40] [--clicks 8] [--gap-ms 150] [--latency-ms 60]
+
+Заглушка Bot API хранит текст и клавиатуру каждой карточки и, как Telegram, отвечает
+«message is not modified» на правку в то же состояние. По каждой карточке модератор жмёт
+--clicks кнопок статусов с паузой до --gap-ms (часть кликов повторяет прошлый статус).
+«before» — каждый вызов сразу уходит в Bot API (прежний путь: no-op правки получают
+ошибку, а _append_status_to_moderation_message на ошибку шлёт отдельный штамп).
+«after» — MODERATION_CARDS: no-op отсекаются по отпечатку, правки внутри окна сливаются
+в последнюю. В обоих прогонах итоговая шапка карточки сверяется со статусом в базе.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import datagen
+import tg_stubs
+from _bootstrap import import_main
+
+workdir = tempfile.mkdtemp(prefix="cxner-bench-card-edits-")
+main = import_main(workdir)
+
+TRANSITIONS = ("upload", "moderate", "approve", "needfix", "delete")
+MODERATOR_ID = 500000001
+
+
+class CardStateBot(tg_stubs.StubBot):
+    """Keeps (text, reply_markup) of moderation chat messages and rejects no-op edits like Telegram."""
+
+    def __init__(self, latency: float):
+        super().__init__()
+        self.latency = latency
+        self.state: dict[int, tuple] = {}
+        self.not_modified = 0
+
+    async def send_message(self, chat_id=None, text=None, reply_markup=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        message = self._record("sendMessage", chat_id=chat_id, text=text, reply_markup=reply_markup, **kwargs)
+        if chat_id == main.MODERATION_CHAT_ID:
+            self.state[message.message_id] = (text, reply_markup)
+        return message
+
+    def _check(self, message_id: int, text, reply_markup) -> None:
+        if self.state.get(message_id) == (text, reply_markup):
+            self.not_modified += 1
+            raise main.BadRequest("Message is not modified: specified new message content and reply markup are exactly the same")
+
+    async def edit_message_text(self, text=None, chat_id=None, message_id=None, reply_markup=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        self._check(message_id, text, reply_markup)
+        self.state[message_id] = (text, reply_markup)
+        return self._record("editMessageText", chat_id=chat_id, message_id=message_id, text=text, **kwargs)
+
+    async def edit_message_reply_markup(self, chat_id=None, message_id=None, reply_markup=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        text = self.state.get(message_id, (None, None))[0]
+        self._check(message_id, text, reply_markup)
+        self.state[message_id] = (text, reply_markup)
+        return self._record("editMessageReplyMarkup", chat_id=chat_id, message_id=message_id, **kwargs)
+
+
+class DirectEditor:
+    """The old path: every card edit goes straight to the Bot API."""
+
+    async def edit(self, bot, message_id, text=None, reply_markup=None, on_error=None):
+        if text is None:
+            await bot.edit_message_reply_markup(chat_id=main.MODERATION_CHAT_ID, message_id=message_id, reply_markup=reply_markup)
+        else:
+            await bot.edit_message_text(
+                chat_id=main.MODERATION_CHAT_ID, message_id=message_id, text=text,
+                parse_mode=main.ParseMode.HTML, reply_markup=reply_markup, disable_web_page_preview=True,
+            )
+        return "sent"
+
+    async def flush(self, timeout=None):
+        pass
+
+
+def payload(artist: int) -> str:
+    return json.dumps({
+        "action": "webapp_release_submit",
+        "submitted_at": datetime.now().isoformat(),
+        "form": {
+            "type": "single", "name": f"Burst {artist}", "subname": ".", "has_lyrics": "yes",
+            "nick": f"burst_{artist}", "fio": "Bench Bench", "version": "-", "genre": "phonk",
+            "date": (datetime.now() + timedelta(days=14)).strftime("%d.%m.%Y"),
+            "link": f"https://example.org/{artist}", "yandex": ".", "mat": "no", "promo": ".", "comment": ".",
+            "tg": f"@burst_{artist}",
+        },
+    })
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def reset() -> None:
+    # оба прогона стартуют с пустых хранилищ: синхронная запись JSON в хендлерах одинакова
+    datagen.write(workdir, {"db": {}, "moderation_db": {"moderation_messages": []}, "history": {}, "cabinet_users": {}}, main)
+    main.db.clear()
+    main.moderation_db["moderation_messages"].clear()
+    main._mark_all_releases_changed()
+
+
+async def run(args, editor, artist_base: int) -> dict:
+    reset()
+    main.MODERATION_CARDS = editor
+    bot = CardStateBot(args.latency_ms / 1000)
+    app = tg_stubs.StubApplication()
+    artists = [artist_base + n for n in range(args.cards)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        for artist in artists:
+            await main.web_app_data_handler(tg_stubs.message_update(bot, artist, web_app_data=payload(artist)), tg_stubs.context(bot, application=app))
+        await app.drain()
+    cards = {str(a): main.db[str(a)][0]["moderation_message_id"] for a in artists}
+    before_calls = len(bot.calls)
+
+    rnd = random.Random(args.seed)
+    latencies = []
+
+    async def burst(user_id: str, message_id: int) -> None:
+        action = rnd.choice(TRANSITIONS)
+        for _ in range(args.clicks):
+            if rnd.random() > args.repeat:
+                action = rnd.choice(TRANSITIONS)
+            update = tg_stubs.callback_update(bot, f"m_{action}_{user_id}_0", MODERATOR_ID, main.MODERATION_CHAT_ID)
+            # кнопка нажата на живой карточке: её текст и клавиатура — как в «Telegram»
+            update.callback_query.message.message_id = message_id
+            update.callback_query.message.text, update.callback_query.message.reply_markup = bot.state[message_id]
+            t0 = time.perf_counter()
+            await main.CALLBACK_ROUTER.dispatch(update, tg_stubs.context(bot, application=app))
+            latencies.append(time.perf_counter() - t0)
+            await asyncio.sleep(rnd.uniform(0, args.gap_ms / 1000))
+
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        await asyncio.gather(*(burst(uid, mid) for uid, mid in cards.items()))
+        await main.MODERATION_CARDS.flush()
+        await app.drain()
+    elapsed = time.perf_counter() - t0
+
+    calls = bot.calls[before_calls:]
+    stale = [
+        uid for uid, mid in cards.items()
+        if not (bot.state[mid][0] or "").startswith(main._status_header(main.db[uid][0]["status"]))
+    ]
+    assert not stale, f"{len(stale)} cards show a stale status"
+    return {
+        "clicks": len(latencies),
+        "edits": sum(1 for m, _ in calls if m in ("editMessageText", "editMessageReplyMarkup")),
+        "not_modified": bot.not_modified,
+        "stamps": sum(1 for m, kw in calls if m == "sendMessage" and main._STATUS_RULE in (kw.get("text") or "")),
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "elapsed_s": elapsed,
+    }
+
+
+def main_cli():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--cards", type=int, default=40)
+    ap.add_argument("--clicks", type=int, default=8, help="clicks per card")
+    ap.add_argument("--gap-ms", type=float, default=150, help="max pause between clicks on one card")
+    ap.add_argument("--repeat", type=float, default=0.3, help="share of clicks repeating the previous status")
+    ap.add_argument("--latency-ms", type=float, default=60)
+    ap.add_argument("--seed", type=int, default=1234)
+    args = ap.parse_args()
+
+    metric = lambda result: main.METRICS.counter("bot_moderation_card_edits_total", result=result).value
+    before = asyncio.run(run(args, DirectEditor(), 910000000))
+    editor = main.ModerationCardEditor(main.MODERATION_EDIT_WINDOW_MS / 1000, main.MODERATION_EDIT_CACHE_SIZE)
+    after = asyncio.run(run(args, editor, 920000000))
+
+    print(f"cards={args.cards} clicks/card={args.clicks} gap<={args.gap_ms:.0f} ms latency={args.latency_ms:.0f} ms window={main.MODERATION_EDIT_WINDOW_MS} ms")
+    print(f"{'':<8}{'clicks':>8}{'edits':>8}{'not_mod':>9}{'stamps':>8}{'p50 ms':>9}{'p95 ms':>9}{'total s':>9}")
+    for name, r in (("before", before), ("after", after)):
+        print(
+            f"{name:<8}{r['clicks']:>8}{r['edits']:>8}{r['not_modified']:>9}{r['stamps']:>8}"
+            f"{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['elapsed_s']:>9.2f}"
+        )
+    print(f"after: skipped {metric('skipped'):.0f}, coalesced {metric('coalesced'):.0f}, not_modified {metric('not_modified'):.0f}, failed {metric('failed'):.0f}")
+    print("OK: every card shows the stored status")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""Mini App diagnostics and readiness: per-payload Bot API probes vs the cached HealthMonitor.
+
+Запуск: python benchmarks/bench_health.py [--payloads 200] [--latency-ms 120]
+
+«before» — прежний _collect_webapp_chain_diag(): getChat, getMe и getChatMember на каждую
+диагностическую анкету. «after» — HEALTH.current(): getMe один раз на процесс, членство в чате
+модерации из кэша с MODERATION_HEALTH_TTL_MS. Проверяется: одновременные промахи кэша ждут
+одну пробу, после ttl кэш обновляется, /healthz отдаёт последний результат без Bot API и
+503, пока бот не в чате или хранилища не загружены.
+"""
+import argparse
+import asyncio
+import json
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from functools import partial
+from http.server import ThreadingHTTPServer
+from types import SimpleNamespace
+
+import tg_stubs
+from _bootstrap import import_main
+
+workdir = tempfile.mkdtemp(prefix="cxner-bench-health-")
+main = import_main(workdir)
+
+
+class ProbeBot(tg_stubs.StubBot):
+    """Answers getChat/getMe/getChatMember after a fixed round trip and counts them."""
+
+    def __init__(self, latency: float, member_status: str = "administrator"):
+        super().__init__()
+        self.latency = latency
+        self.member_status = member_status
+
+    async def get_chat(self, chat_id):
+        await asyncio.sleep(self.latency)
+        self.calls.append(("getChat", {"chat_id": chat_id}))
+        return SimpleNamespace(id=chat_id, title="Moderation", username=None)
+
+    async def get_me(self):
+        await asyncio.sleep(self.latency)
+        self.calls.append(("getMe", {}))
+        return SimpleNamespace(id=777, username="cxner_bench_bot")
+
+    async def get_chat_member(self, chat_id, user_id):
+        await asyncio.sleep(self.latency)
+        self.calls.append(("getChatMember", {"chat_id": chat_id, "user_id": user_id}))
+        return SimpleNamespace(status=self.member_status)
+
+    def probes(self) -> int:
+        return sum(1 for method, _ in self.calls if method in ("getChat", "getMe", "getChatMember"))
+
+
+async def legacy_diag(context) -> dict:
+    # прежнее тело _collect_webapp_chain_diag
+    info = {"chat_ok": False, "bot_member_status": "", "bot_is_admin": False, "errors": []}
+    try:
+        await context.bot.get_chat(main.MODERATION_CHAT_ID)
+        info["chat_ok"] = True
+    except Exception as e:
+        info["errors"].append(f"get_chat_failed: {e}")
+        return info
+    try:
+        me = await context.bot.get_me()
+        member = await context.bot.get_chat_member(main.MODERATION_CHAT_ID, me.id)
+        info["bot_member_status"] = str(member.status)
+        info["bot_is_admin"] = member.status in {"administrator", "creator"}
+    except Exception as e:
+        info["errors"].append(f"get_chat_member_failed: {e}")
+    return info
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+async def diag_latency(collect, payloads: int, latency: float) -> tuple[list, int]:
+    bot = ProbeBot(latency)
+    context = tg_stubs.context(bot)
+    times = []
+    for _ in range(payloads):
+        t0 = time.perf_counter()
+        info = await collect(context)
+        times.append(time.perf_counter() - t0)
+        assert info["chat_ok"] and info["bot_is_admin"], info
+    return times, bot.probes()
+
+
+async def check_single_flight(concurrent: int, latency: float) -> int:
+    main.HEALTH = main.HealthMonitor(60)
+    bot = ProbeBot(latency)
+    results = await asyncio.gather(*(main.HEALTH.current(bot) for _ in range(concurrent)))
+    assert all(r["ok"] for r in results)
+    return bot.probes()
+
+
+async def check_refresh(latency: float) -> tuple[int, int]:
+    ttl = 0.2
+    main.HEALTH = main.HealthMonitor(ttl)
+    bot = ProbeBot(latency)
+    main.HEALTH.start(bot)
+    try:
+        await asyncio.sleep(latency * 4)
+        first = bot.probes()
+        # бот выгнали из чата: фоновая проба заметит это не позже чем через ttl
+        bot.member_status = "left"
+        await asyncio.sleep(ttl + latency * 4)
+        report = main.HEALTH.report()
+        assert not report["ok"] and not report["stale"], report
+        # getMe не повторяется: на каждую следующую пробу только getChat + getChatMember
+        calls = [m for m, _ in bot.calls]
+        assert calls.count("getMe") == 1, calls
+        return first, bot.probes()
+    finally:
+        await main.HEALTH.stop()
+
+
+def healthz(port: int) -> tuple[int, dict, float]:
+    t0 = time.perf_counter()
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/healthz", timeout=5) as resp:
+            status, body = resp.status, resp.read()
+    except urllib.error.HTTPError as e:
+        status, body = e.code, e.read()
+    return status, json.loads(body), time.perf_counter() - t0
+
+
+def check_endpoint(requests: int) -> dict:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(main._WebAppRequestHandler, directory=workdir))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+    try:
+        main.HEALTH = main.HealthMonitor(60)
+        main._stores_ready.set()
+        status, body, _ = healthz(port)
+        assert status == 503 and body["errors"] == ["not_probed_yet"], (status, body)
+
+        bot = ProbeBot(0.0)
+        asyncio.run(main.HEALTH.probe(bot))
+        probes = bot.probes()
+        times = []
+        for _ in range(requests):
+            status, body, elapsed = healthz(port)
+            assert status == 200 and body["ok"] and body["bot_is_admin"], (status, body)
+            times.append(elapsed)
+        assert bot.probes() == probes, "/healthz called the Bot API"
+
+        main._stores_ready.clear()
+        status, body, _ = healthz(port)
+        assert status == 503 and not body["stores_ready"], (status, body)
+        main._stores_ready.set()
+        return {"p50_ms": percentile(times, 0.5) * 1000, "p95_ms": percentile(times, 0.95) * 1000}
+    finally:
+        server.shutdown()
+
+
+def main_cli():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--payloads", type=int, default=200, help="diagnostic payloads in a row")
+    ap.add_argument("--latency-ms", type=float, default=120, help="Bot API round trip")
+    ap.add_argument("--concurrent", type=int, default=50, help="simultaneous cache misses")
+    ap.add_argument("--healthz-requests", type=int, default=200)
+    args = ap.parse_args()
+    latency = args.latency_ms / 1000
+
+    before, before_calls = asyncio.run(diag_latency(legacy_diag, args.payloads, latency))
+    main.HEALTH = main.HealthMonitor(main.MODERATION_HEALTH_TTL_MS / 1000)
+    after, after_calls = asyncio.run(diag_latency(main._collect_webapp_chain_diag, args.payloads, latency))
+
+    print(f"payloads={args.payloads} latency={args.latency_ms:.0f} ms ttl={main.MODERATION_HEALTH_TTL_MS / 1000:.0f} s")
+    print(f"{'':<8}{'api calls':>11}{'p50 ms':>10}{'p95 ms':>10}")
+    for name, times, calls in (("before", before, before_calls), ("after", after, after_calls)):
+        print(f"{name:<8}{calls:>11}{percentile(times, 0.5) * 1000:>10.3f}{percentile(times, 0.95) * 1000:>10.3f}")
+
+    flight = asyncio.run(check_single_flight(args.concurrent, latency))
+    assert flight == 3, flight
+    print(f"single flight: {args.concurrent} concurrent misses -> {flight} API calls (one probe)")
+    first, total = asyncio.run(check_refresh(0.01))
+    print(f"refresh: background probe noticed the bot leaving the chat within ttl ({first} -> {total} calls, getMe once)")
+    endpoint = check_endpoint(args.healthz_requests)
+    print(
+        f"/healthz: {args.healthz_requests} requests, p50 {endpoint['p50_ms']:.2f} ms, p95 {endpoint['p95_ms']:.2f} ms, "
+        f"0 API calls; 503 before the first probe and while stores load"
+    )
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""Bot API connection pools: one shared pool vs separate main and bulk pools, against the fake API.
+
+Запуск: python benchmarks/bench_http_pools.py [--burst 1000] [--interactive 200] [--latency-ms 150]
+
+Поднимается fake_telegram_api.py, бот — настоящий ExtBot с build_request() из main.py.
+Пока идёт пачка из --burst одновременных sendMessage (рассылка, fan-out, outbox), модератор
+жмёт кнопки: --interactive вызовов answerCallbackQuery с темпом --rate в секунду.
+«shared» — всё идёт через пул «main» (как раньше: рассылки и ответы делили пул).
+«split» — пачка идёт через BULK_BOT на пуле «bulk». Меряется задержка интерактивных вызовов,
+их отказы по pool timeout и время пачки; насыщение пулов — из метрик bot_http_pool_*.
+В «shared» пачка больше пула ждёт соединение не дольше TELEGRAM_POOL_TIMEOUT_MS (1 с, как
+PTB по умолчанию) и большей частью отваливается, а очередь из сотен ожидающих запросов
+тормозит и сам пул; в «split» у пула bulk долгий pool timeout, и пачка просто дожидается очереди.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import tempfile
+import time
+
+from _bootstrap import import_main
+from fake_telegram_api import FakeTelegramAPI
+
+workdir = tempfile.mkdtemp(prefix="cxner-bench-http-pools-")
+main = import_main(workdir)
+
+TOKEN = "123456:BENCH"
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else float("nan")
+
+
+def make_bot(api: FakeTelegramAPI, pool: str):
+    return main.ExtBot(TOKEN, base_url=f"{api.url}/bot", request=main.build_request(pool))
+
+
+def counter(name: str, pool: str) -> float:
+    return main.METRICS.counter(name, pool=pool).value
+
+
+async def run(args, api: FakeTelegramAPI, split: bool) -> dict:
+    main.HTTP_POOLS.clear()
+    interactive_bot = make_bot(api, "main")
+    bulk_bot = make_bot(api, "bulk") if split else interactive_bot
+    before = {pool: (counter("bot_http_pool_saturated_total", pool), counter("bot_http_pool_timeouts_total", pool)) for pool in ("main", "bulk")}
+    latencies, failures = [], 0
+
+    async def bulk_send(n: int):
+        return await bulk_bot.send_message(700000000 + n, f"broadcast {n}")
+
+    async def click(n: int) -> None:
+        nonlocal failures
+        t0 = time.perf_counter()
+        try:
+            await interactive_bot.answer_callback_query(str(n))
+            latencies.append(time.perf_counter() - t0)
+        except main.TimedOut:
+            failures += 1
+
+    async def clicks() -> None:
+        tasks = []
+        for n in range(args.interactive):
+            tasks.append(asyncio.ensure_future(click(n)))
+            await asyncio.sleep(1 / args.rate)
+        await asyncio.gather(*tasks)
+
+    t0 = time.perf_counter()
+    burst = asyncio.gather(*(bulk_send(n) for n in range(args.burst)), return_exceptions=True)
+    burst_elapsed = None
+
+    async def timed_burst():
+        nonlocal burst_elapsed
+        results = await burst
+        burst_elapsed = time.perf_counter() - t0
+        return results
+
+    results, _ = await asyncio.gather(timed_burst(), clicks())
+    bulk_failed = sum(1 for r in results if isinstance(r, Exception))
+    peaks = {name: req.peak for name, req in main.HTTP_POOLS.items()}
+    for bot in {interactive_bot, bulk_bot}:
+        await bot.request.shutdown()
+    return {
+        "p50": percentile(latencies, 0.5) * 1000,
+        "p95": percentile(latencies, 0.95) * 1000,
+        "max": max(latencies, default=float("nan")) * 1000,
+        "failures": failures,
+        "bulk_s": burst_elapsed,
+        "bulk_failed": bulk_failed,
+        "saturated": {pool: counter("bot_http_pool_saturated_total", pool) - before[pool][0] for pool in before},
+        "timeouts": {pool: counter("bot_http_pool_timeouts_total", pool) - before[pool][1] for pool in before},
+        "peaks": peaks,
+    }
+
+
+def main_cli():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--burst", type=int, default=1000, help="concurrent bulk sendMessage calls")
+    ap.add_argument("--interactive", type=int, default=200, help="answerCallbackQuery calls during the burst")
+    ap.add_argument("--rate", type=float, default=200.0, help="interactive calls per second")
+    ap.add_argument("--latency-ms", type=float, default=150.0)
+    ap.add_argument("--jitter-ms", type=float, default=30.0)
+    ap.add_argument("--pool", type=int, default=main.TELEGRAM_POOL_SIZE, help="TELEGRAM_POOL_SIZE")
+    ap.add_argument("--bulk-pool", type=int, default=main.TELEGRAM_BULK_POOL_SIZE, help="TELEGRAM_BULK_POOL_SIZE")
+    args = ap.parse_args()
+
+    main.TELEGRAM_POOL_SIZE = args.pool
+    main.TELEGRAM_BULK_POOL_SIZE = args.bulk_pool
+    api = FakeTelegramAPI(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms).start()
+    try:
+        print(
+            f"burst={args.burst} interactive={args.interactive}@{args.rate:.0f}/s latency={args.latency_ms:.0f}±{args.jitter_ms:.0f} ms "
+            f"pool={args.pool} bulk_pool={args.bulk_pool} pool_timeout={main.TELEGRAM_POOL_TIMEOUT_MS} ms"
+        )
+        print(f"{'':<8}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}{'failed':>8}{'bulk s':>8}{'bulk err':>9}  saturated / pool timeouts / peak in flight")
+        for name, split in (("shared", False), ("split", True)):
+            with contextlib.redirect_stdout(io.StringIO()):
+                r = asyncio.run(run(args, api, split))
+            pools = ", ".join(
+                f"{pool} {r['saturated'][pool]:.0f}/{r['timeouts'][pool]:.0f}/{r['peaks'][pool]}" for pool in r["peaks"]
+            )
+            print(
+                f"{name:<8}{r['p50']:>9.1f}{r['p95']:>9.1f}{r['max']:>9.1f}{r['failures']:>8}"
+                f"{r['bulk_s']:>8.2f}{r['bulk_failed']:>9}  {pools}"
+            )
+    finally:
+        api.stop()
+
+
+if __name__ == "__main__":
+    main_cli()
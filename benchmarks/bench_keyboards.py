@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""Allocation check for inline keyboards, before vs after (tracemalloc).
+
+Запуск: python benchmarks/bench_keyboards.py [--callbacks 2000]
+
+Для каждого сценария вызываем построение клавиатуры столько раз, сколько callback'ов
+пришло бы от пользователей, держим ссылки на результат (как это делает отправленный
+Update) и считаем байты/блоки, приходящиеся на один callback.
+"""
+import argparse
+import sys
+import tracemalloc
+
+from _bootstrap import import_main
+
+main = import_main()
+InlineKeyboardButton = main.InlineKeyboardButton
+InlineKeyboardMarkup = main.InlineKeyboardMarkup
+
+
+def legacy_main_menu():
+    rows = [
+        [InlineKeyboardButton("📀 Дистрибуция", callback_data='menu_distribution')],
+        [InlineKeyboardButton("💼 Сервисы", callback_data='menu_services')],
+        [InlineKeyboardButton("🧑‍💻 Кабинет", callback_data='menu_cabinet')],
+        [InlineKeyboardButton("🌐 Комьюнити", callback_data='menu_community')],
+    ]
+    rows.append([InlineKeyboardButton("Открыть приложение", callback_data='open_app')])
+    return InlineKeyboardMarkup(rows)
+
+
+def legacy_moderation(user_id, idx):
+    return InlineKeyboardMarkup([
+        [
+            InlineKeyboardButton("🕓 На отгрузке", callback_data=f"m_upload_{user_id}_{idx}"),
+            InlineKeyboardButton("🧠 Модерация", callback_data=f"m_moderate_{user_id}_{idx}"),
+            InlineKeyboardButton("✅ Принято", callback_data=f"m_approve_{user_id}_{idx}")
+        ],
+        [
+            InlineKeyboardButton("❌ Отклонить", callback_data=f"m_reject_{user_id}_{idx}"),
+            InlineKeyboardButton("✏️ На исправлении", callback_data=f"m_needfix_{user_id}_{idx}"),
+            InlineKeyboardButton("🗑 Удален", callback_data=f"m_delete_{user_id}_{idx}")
+        ],
+    ])
+
+
+def measure(fn, callbacks):
+    keep = []
+    fn(0)  # прогрев: первая сборка синглтона/записи LRU не считается
+    tracemalloc.start()
+    blocks_before = sys.getallocatedblocks()
+    before, _ = tracemalloc.get_traced_memory()
+    for i in range(callbacks):
+        keep.append(fn(i))
+    after, peak = tracemalloc.get_traced_memory()
+    blocks = sys.getallocatedblocks() - blocks_before
+    tracemalloc.stop()
+    return (after - before) / callbacks, blocks / callbacks
+
+
+def main_cli():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--callbacks", type=int, default=2000)
+    ap.add_argument("--releases", type=int, default=50, help="distinct moderation cards being clicked")
+    args = ap.parse_args()
+    n, releases = args.callbacks, args.releases
+
+    scenarios = [
+        ("main menu", lambda i: legacy_main_menu(), lambda i: main.build_main_menu_keyboard()),
+        ("moderation card", lambda i: legacy_moderation("123456", i % releases),
+         lambda i: main._moderation_keyboard("123456", i % releases, main.STATUS_MODERATION)),
+    ]
+    print(f"{'scenario':<18}{'bytes/cb before':>17}{'after':>10}{'blocks/cb before':>18}{'after':>10}")
+    for name, before, after in scenarios:
+        b_bytes, b_blocks = measure(before, n)
+        a_bytes, a_blocks = measure(after, n)
+        print(f"{name:<18}{b_bytes:>17.0f}{a_bytes:>10.0f}{b_blocks:>18.1f}{a_blocks:>10.1f}")
+
+    # синглтоны и LRU действительно отдают один и тот же объект
+    assert main.build_main_menu_keyboard() is main.build_main_menu_keyboard()
+    assert main._moderation_keyboard("1", 0) is main._build_moderation_keyboard("1", 0)
+    info = main._moderation_keyboard_cached.cache_info()
+    print(f"moderation keyboard LRU: hits={info.hits} misses={info.misses} size={info.currsize}/{info.maxsize}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""Overhead of handler instrumentation and cost of a /metrics scrape.
+
+Запуск: python benchmarks/bench_metrics.py [--calls 200000] [--series 300]
+
+Сравниваем вызов пустого async-обработчика напрямую и через обёртку instrument_application,
+затем рендерим реестр с заданным числом гистограмм (примерно столько даёт живой бот:
+обработчик x состояние диалога + маршруты callback + методы Bot API).
+"""
+import argparse
+import asyncio
+import time
+
+from _bootstrap import import_main
+
+main = import_main()
+
+
+async def noop(update, context):
+    return None
+
+
+class _Handler:
+    def __init__(self, callback):
+        self.callback = callback
+
+
+async def per_call(callback, calls: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(calls):
+        await callback(None, None)
+    return (time.perf_counter() - t0) / calls
+
+
+def main_cli():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--calls", type=int, default=200000)
+    ap.add_argument("--series", type=int, default=300)
+    args = ap.parse_args()
+
+    handler = _Handler(noop)
+    main._instrument_handler(handler, "bench")
+    bare = asyncio.run(per_call(noop, args.calls))
+    wrapped = asyncio.run(per_call(handler.callback, args.calls))
+    print(f"handler call: bare {bare * 1e9:.0f} ns, instrumented {wrapped * 1e9:.0f} ns, overhead {(wrapped - bare) * 1e9:.0f} ns")
+
+    for n in range(args.series):
+        hist = main.METRICS.histogram("bot_handler_duration_seconds", handler=f"h{n}", state="global")
+        for k in range(50):
+            hist.observe(k / 1000)
+        main.METRICS.inc("bot_handler_errors_total", handler=f"h{n}", state="global")
+    t0 = time.perf_counter()
+    body = main.METRICS.render()
+    took = time.perf_counter() - t0
+    print(f"render: {args.series} histograms, {len(body) / 1024:.0f} KiB in {took * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main_cli()
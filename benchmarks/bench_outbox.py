@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""Artist notifications: inline send in the moderation handler vs the durable outbox.
+
+Запуск: python benchmarks/bench_outbox.py [--notices 200] [--latency-ms 300]
+
+«before» — прежний путь: хендлер модерации сам ждал send_message артисту, и медленный
+или флудящий чат артиста задерживал ответ модератору. «after» — notify_artist_status():
+строка коммитится в outbox.sqlite3, доставку делает воркер. Кроме задержки проверяется:
+после закрытия и повторного открытия базы воркер досылает всё ровно по разу и по порядку
+в каждом чате; повтор ключа игнорируется, новый статус релиза вытесняет неотправленный;
+сетевые ошибки повторяются с backoff, RetryAfter не тратит попытку, Forbidden — сразу dead.
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+import tg_stubs
+from _bootstrap import import_main
+
+workdir = tempfile.mkdtemp(prefix="cxner-bench-outbox-")
+main = import_main(workdir)
+
+MODERATOR = "mod_bench"
+
+
+class SlowBot(tg_stubs.StubBot):
+    """Bot API stub with a fixed round-trip and scripted failures per chat."""
+
+    def __init__(self, latency: float = 0.0, failures: dict | None = None):
+        super().__init__()
+        self.latency = latency
+        self.failures = {chat: list(errors) for chat, errors in (failures or {}).items()}
+
+    async def send_message(self, chat_id=None, text=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        errors = self.failures.get(chat_id)
+        if errors:
+            raise errors.pop(0)
+        return self._record("sendMessage", chat_id=chat_id, text=text, **kwargs)
+
+    def sent(self) -> list:
+        return [(kw["chat_id"], kw["text"]) for method, kw in self.calls if method == "sendMessage"]
+
+
+def release(n: int) -> dict:
+    return {"name": f"Release {n}", "nick": f"artist_{n}", "status": main.STATUS_MODERATION, "moderation_time": f"2025-01-01T12:00:{n:05d}"}
+
+
+def fresh_outbox(name: str) -> "main.NotificationOutbox":
+    main.OUTBOX.close()
+    main.OUTBOX = main.NotificationOutbox(os.path.join(workdir, name))
+    return main.OUTBOX
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+async def drain(outbox, bot, timeout: float = 30.0) -> None:
+    task = asyncio.get_running_loop().create_task(outbox.run(bot))
+    deadline = time.monotonic() + timeout
+    try:
+        while outbox.pending():
+            assert time.monotonic() < deadline, f"{outbox.pending()} notifications stuck"
+            await asyncio.sleep(0.01)
+    finally:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+
+async def handler_latency(count: int, latency: float) -> tuple[list, list]:
+    bot = SlowBot(latency)
+    before, after = [], []
+    for n in range(count):
+        rel = release(n)
+        t0 = time.perf_counter()
+        # прежний хвост _mod_approve
+        try:
+            await bot.send_message(
+                int(1000 + n),
+                main._render_artist_status_notice(rel, main.STATUS_APPROVED, MODERATOR),
+                parse_mode=main.ParseMode.HTML,
+            )
+        except Exception as e:
+            print(f"send failed: {e}")
+        before.append(time.perf_counter() - t0)
+
+    fresh_outbox("latency.sqlite3")
+    for n in range(count):
+        rel = release(n)
+        t0 = time.perf_counter()
+        main.notify_artist_status(str(1000 + n), 0, rel, main.STATUS_APPROVED, MODERATOR)
+        after.append(time.perf_counter() - t0)
+    return before, after
+
+
+async def check_restart(count: int, seed: int) -> int:
+    outbox = fresh_outbox("restart.sqlite3")
+    rnd = random.Random(seed)
+    chats = [2000 + n for n in range(10)]
+    expected: dict[int, list] = {chat: [] for chat in chats}
+    for n in range(count):
+        chat = rnd.choice(chats)
+        text = f"notice {n}"
+        outbox.enqueue(chat, text, f"bench:{n}")
+        expected[chat].append(text)
+    # «рестарт»: соединение закрыто, новый процесс открывает тот же файл
+    outbox.close()
+    outbox = fresh_outbox("restart.sqlite3")
+    assert outbox.pending() == count, outbox.pending()
+    bot = SlowBot(0.001)
+    await drain(outbox, bot)
+    got: dict[int, list] = {chat: [] for chat in chats}
+    for chat, text in bot.sent():
+        got[chat].append(text)
+    assert got == expected, "lost, duplicated or reordered notifications after restart"
+    return count
+
+
+def check_dedup() -> None:
+    outbox = fresh_outbox("dedup.sqlite3")
+    rel = release(1)
+    assert main.notify_artist_status("3000", 0, rel, main.STATUS_ON_UPLOAD, MODERATOR)
+    assert not main.notify_artist_status("3000", 0, rel, main.STATUS_ON_UPLOAD, MODERATOR), "duplicate key queued twice"
+    rel["moderation_time"] = "2025-01-02T00:00:00"
+    assert main.notify_artist_status("3000", 0, rel, main.STATUS_APPROVED, MODERATOR)
+    assert main.notify_artist_status("3000", 1, rel, main.STATUS_APPROVED, MODERATOR)
+    rows = outbox._db().execute("SELECT dedup_key FROM outbox WHERE state = 'pending' ORDER BY id").fetchall()
+    assert [key for key, in rows] == [
+        f"status:3000:0:{main.STATUS_APPROVED}:2025-01-02T00:00:00",
+        f"status:3000:1:{main.STATUS_APPROVED}:2025-01-02T00:00:00",
+    ], rows
+
+
+async def check_retries() -> dict:
+    outbox = fresh_outbox("retries.sqlite3")
+    outbox._RETRY_BASE = 0.05
+    flaky, flood, blocked = 4001, 4002, 4003
+    bot = SlowBot(failures={
+        flaky: [main.TimedOut(), ConnectionResetError("reset")],
+        flood: [main.RetryAfter(1)] * 3,
+        blocked: [main.Forbidden("bot was blocked by the user")],
+    })
+    for chat in (flaky, flood, blocked):
+        outbox.enqueue(chat, f"first {chat}", f"retry:{chat}:1")
+        outbox.enqueue(chat, f"second {chat}", f"retry:{chat}:2")
+    t0 = time.monotonic()
+    await drain(outbox, bot)
+    states = dict(outbox._db().execute("SELECT dedup_key, state || ':' || attempts FROM outbox").fetchall())
+    assert states[f"retry:{flaky}:1"] == "sent:2", states
+    assert states[f"retry:{flood}:1"] == "sent:0", states
+    assert states[f"retry:{blocked}:1"] == "dead:0", states
+    assert [t for c, t in bot.sent() if c == flaky] == [f"first {flaky}", f"second {flaky}"]
+    return {"elapsed_s": time.monotonic() - t0, "states": states}
+
+
+def main_cli():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--notices", type=int, default=200)
+    ap.add_argument("--latency-ms", type=float, default=300, help="simulated round-trip of a slow artist chat")
+    ap.add_argument("--restart-notices", type=int, default=500)
+    ap.add_argument("--seed", type=int, default=1234)
+    args = ap.parse_args()
+
+    # лимиты fan-out здесь не меряются (см. bench_bulk_moderation.py) — убираем их
+    main.BULK_FANOUT = main.FanoutLimiter(10_000, 0)
+    before, after = asyncio.run(handler_latency(args.notices, args.latency_ms / 1000))
+    print(f"notices={args.notices} artist chat latency={args.latency_ms:.0f} ms")
+    print(f"{'':<28}{'p50 ms':>10}{'p95 ms':>10}")
+    print(f"{'inline send_message':<28}{percentile(before, 0.5) * 1000:>10.2f}{percentile(before, 0.95) * 1000:>10.2f}")
+    print(f"{'outbox enqueue':<28}{percentile(after, 0.5) * 1000:>10.3f}{percentile(after, 0.95) * 1000:>10.3f}")
+
+    drained = asyncio.run(check_restart(args.restart_notices, args.seed))
+    print(f"restart: {drained} queued before close, all delivered once and in per-chat order")
+    check_dedup()
+    print("dedup: repeated key ignored, newer status of a release replaces the unsent one")
+    retries = asyncio.run(check_retries())
+    print(f"retries: network errors retried with backoff, RetryAfter free, Forbidden dead ({retries['elapsed_s']:.1f} s)")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""Admin release queues: legacy full-catalogue sort vs per-queue ordered indexes with cursors.
+
+Запуск: python benchmarks/bench_queues.py [--releases 1000 10000 100000]
+
+«before» — прежний all_releases_list: собрать весь каталог, отсортировать по времени отправки,
+показать первые 15. «after» — RELEASE_QUEUES.page(): срез по bisect из индекса очереди.
+Кроме времени проверяется, что обход всех страниц курсорами вперёд и назад, фильтры по
+артисту и периоду и перенос релиза между очередями после смены статуса совпадают с перебором.
+"""
+import argparse
+import random
+import time
+
+import datagen
+from _bootstrap import import_main
+
+main = import_main()
+
+
+def legacy_all_releases():
+    all_releases = []
+    for user_id, releases in main.db.items():
+        for idx, release in enumerate(releases):
+            all_releases.append((user_id, idx, release))
+    all_releases.sort(key=lambda x: x[2].get('submission_time', ''), reverse=True)
+    return all_releases[:15]
+
+
+def brute(view) -> list:
+    rows = []
+    for uid, releases in main.db.items():
+        if view.artist and uid != view.artist:
+            continue
+        for idx, release in enumerate(releases):
+            key = (main._submission_ts(release), uid, idx)
+            if view.queue not in main._release_queue_codes(release):
+                continue
+            if view.since is not None and not view.since_ts() <= key[0] < view.until_ts():
+                continue
+            rows.append(key)
+    return [(uid, idx) for _, uid, idx in sorted(rows, reverse=True)]
+
+
+def walk(view, per_page: int) -> tuple[list, list]:
+    """Collects the queue page by page via encoded cursors, then walks back to the first page."""
+    forward, pages = [], []
+    while True:
+        items, _, _, has_newer, has_older = main.RELEASE_QUEUES.page(view, per_page)
+        pages.append([(uid, idx) for uid, idx, _ in items])
+        forward += pages[-1]
+        if not has_older:
+            break
+        buttons = main._queue_keyboard(view, items, has_newer, has_older).inline_keyboard[-1]
+        view = main.QueueView.decode(buttons[-1].callback_data[len("aq_"):])
+    backward = []
+    while True:
+        items, _, _, has_newer, has_older = main.RELEASE_QUEUES.page(view, per_page)
+        backward = [(uid, idx) for uid, idx, _ in items] + backward
+        if not has_newer:
+            break
+        buttons = main._queue_keyboard(view, items, has_newer, has_older).inline_keyboard[-1]
+        assert len(buttons[0].callback_data) <= 64, buttons[0].callback_data
+        view = main.QueueView.decode(buttons[0].callback_data[len("aq_"):])
+    return forward, backward
+
+
+def best(fn, repeat: int = 5) -> float:
+    out = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        out = min(out, time.perf_counter() - t0)
+    return out
+
+
+def run(count: int, seed: int) -> dict:
+    main.db.clear()
+    main.db.update(datagen.generate(count, seed)["db"])
+    main._mark_all_releases_changed()
+    rebuild = best(main.RELEASE_QUEUES.rebuild, 3)
+
+    rnd = random.Random(seed)
+    deep = main.QueueView("a", cursor=(main._submission_ts(rnd.choice(list(main.db.values()))[0]), "0", 0))
+    per_page = main.ADMIN_QUEUE_PAGE_SIZE
+    result = {
+        "releases": count,
+        "legacy_ms": best(legacy_all_releases) * 1000,
+        "first_ms": best(lambda: main.RELEASE_QUEUES.page(main.QueueView("a"), per_page)) * 1000,
+        "deep_ms": best(lambda: main.RELEASE_QUEUES.page(deep, per_page)) * 1000,
+        "render_ms": best(lambda: main._render_release_queue(main.QueueView("w"))) * 1000,
+        "rebuild_ms": rebuild * 1000,
+    }
+
+    # корректность: небольшие очереди обходим целиком и сверяем с перебором
+    artist = max(main.db, key=lambda uid: len(main.db[uid]))
+    today = main.datetime(2025, 1, 1).toordinal()
+    views = [
+        main.QueueView("f"),
+        main.QueueView("d"),
+        main.QueueView("a", artist=artist),
+        main.QueueView("r", since=today - 30, until=today - 1),
+    ]
+    for view in views:
+        expected = brute(view)
+        forward, backward = walk(view, 7)
+        assert forward == expected, f"{view.encode()}: forward walk differs"
+        assert backward == expected, f"{view.encode()}: backward walk differs"
+
+    uid, idx = rnd.choice([(u, i) for u, rels in main.db.items() for i in range(len(rels))])
+    main.db[uid][idx]["status"] = main.STATUS_NEEDS_FIX if main.db[uid][idx].get("status") != main.STATUS_NEEDS_FIX else main.STATUS_REJECTED
+    t0 = time.perf_counter()
+    main._mark_release_changed(uid, idx)
+    result["update_us"] = (time.perf_counter() - t0) * 1e6
+    for code in ("f", "r", "w", "a"):
+        assert walk(main.QueueView(code), 50)[0] == brute(main.QueueView(code)), f"queue {code} after a status change"
+    return result
+
+
+def main_cli():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--releases", type=int, nargs="+", default=[1000, 10000, 100000])
+    ap.add_argument("--seed", type=int, default=1234)
+    args = ap.parse_args()
+
+    print(f"{'releases':>9}{'legacy ms':>11}{'page ms':>9}{'deep ms':>9}{'render ms':>11}{'rebuild ms':>12}{'update us':>11}")
+    for count in args.releases:
+        r = run(count, args.seed)
+        print(
+            f"{r['releases']:>9}{r['legacy_ms']:>11.2f}{r['first_ms']:>9.3f}{r['deep_ms']:>9.3f}"
+            f"{r['render_ms']:>11.3f}{r['rebuild_ms']:>12.1f}{r['update_us']:>11.1f}"
+        )
+    print("OK: cursor walks, filters and status moves match a full scan")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""Release form validation throughput: the old inline Mini App validator vs the compiled RELEASE_SCHEMA.
+
+Запуск: python benchmarks/bench_release_schema.py [--payloads 100000] [--legacy-share 0.25] [--invalid-share 0.2]
+
+Синтетические анкеты: современная форма Mini App, плоский payload старых сборок (track_title,
+artist_name, ISO-дата, telegram_contact), альбомы с треклистом и без, битые даты и ссылки,
+пустые обязательные поля. «before» — копия прежнего блока из web_app_data_handler: маппинг
+старых ключей, strptime, urlparse и цепочки clean(str(...)).strip().lower() на каждое поле.
+«after» — RELEASE_SCHEMA.validate() по одной анкете и validate_many() пачкой, clean() с
+быстрым путём для строк без лишних пробелов. Время — лучший из --repeat прогонов. Результаты
+сверяются: нормализованные поля и число ошибок должны совпасть для каждой анкеты.
+"""
+import argparse
+import gc
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
+
+from _bootstrap import import_main
+
+workdir = tempfile.mkdtemp(prefix="cxner-bench-release-schema-")
+main = import_main(workdir)
+
+# канонические значения берутся из main.py, чтобы сравнивать строки в одной кодировке
+YES, NO = main._YES_NO["yes"], main._YES_NO["no"]
+NO_LYRICS = main._LYRICS["no"]
+SINGLE, ALBUM = main._RELEASE_TYPES["single"], main._RELEASE_TYPES["album"]
+ORIGINAL = main.RELEASE_SCHEMA.by_key["version"].default
+YES_WORDS = {k for k, v in main._YES_NO.items() if v == YES}
+NO_WORDS = {k for k, v in main._YES_NO.items() if v == NO}
+NO_LYRICS_WORDS = {k for k, v in main._LYRICS.items() if v == NO_LYRICS}
+SINGLE_WORDS = {k for k, v in main._RELEASE_TYPES.items() if v == SINGLE}
+ALBUM_WORDS = {k for k, v in main._RELEASE_TYPES.items() if v == ALBUM}
+YANDEX_BLANK = main.RELEASE_SCHEMA.by_key["yandex"].blank
+
+
+def clean(text):
+    # прежний clean(): split/join на каждую строку, без быстрого пути
+    return ' '.join([w for w in text.split() if not w.lower().startswith(('1.', '2.', '3.'))]).strip()
+
+
+def old_looks_like_url(text: str) -> bool:
+    if not text or not isinstance(text, str):
+        return False
+    text = text.strip()
+    if text == ".":
+        return True
+    p = urlparse(text)
+    if p.scheme not in ("http", "https"):
+        return False
+    if not p.netloc:
+        return False
+    if "." not in p.netloc and p.netloc != "localhost":
+        return False
+    return True
+
+
+def old_optional(value, default: str = ".") -> str:
+    text = clean(str(value or "")).strip()
+    return text if text else default
+
+
+def old_validate(form: dict, action: str) -> tuple[dict, int]:
+    """The validation block of web_app_data_handler before RELEASE_SCHEMA, messages replaced by counts."""
+    legacy_form_detected = (
+        not form.get("type")
+        and any(form.get(k) for k in ("artist_name", "track_title", "release_date", "telegram_contact", "contact"))
+    )
+    if action == "submit_release" or legacy_form_detected:
+        legacy_date = clean(str(form.get("release_date") or form.get("date") or "")).strip()
+        if legacy_date and "-" in legacy_date:
+            try:
+                legacy_date = datetime.strptime(legacy_date, "%Y-%m-%d").strftime("%d.%m.%Y")
+            except ValueError:
+                pass
+        legacy_type_raw = clean(str(form.get("release_type") or form.get("type") or "single")).strip().lower()
+        legacy_type = ALBUM if legacy_type_raw in ALBUM_WORDS else SINGLE
+        legacy_has_lyrics = clean(str(form.get("has_lyrics") or form.get("lyrics") or "")).strip()
+        legacy_mat = clean(str(form.get("mat") or "")).strip()
+        form = {
+            "type": legacy_type,
+            "name": form.get("track_title") or form.get("name") or "",
+            "subname": form.get("subname") or ".",
+            "has_lyrics": legacy_has_lyrics or NO_LYRICS,
+            "nick": form.get("artist_name") or form.get("nick") or "",
+            "fio": form.get("artist_name") or form.get("fio") or "",
+            "date": legacy_date,
+            "version": form.get("version") or ORIGINAL,
+            "genre": form.get("genre") or "",
+            "link": form.get("link") or form.get("files_link") or form.get("audio_link") or ".",
+            "yandex": form.get("yandex") or form.get("yandex_link") or ".",
+            "mat": legacy_mat or NO,
+            "promo": form.get("promo") or ".",
+            "comment": form.get("comment") or ".",
+            "tracklist": form.get("tracklist") or ".",
+            "tg": form.get("telegram_contact") or form.get("contact") or form.get("tg") or "",
+        }
+
+    errors = 0
+    v = clean(str(form.get("type", "") or "")).strip().lower()
+    release_type = SINGLE if v in SINGLE_WORDS else ALBUM if v in ALBUM_WORDS else None
+    errors += not release_type
+    name = clean(str(form.get("name", ""))).strip()
+    errors += not name
+    subname = old_optional(form.get("subname"), ".")
+    has_lyrics_raw = clean(str(form.get("has_lyrics", ""))).strip().lower()
+    if has_lyrics_raw in YES_WORDS:
+        has_lyrics = YES
+    elif has_lyrics_raw in NO_LYRICS_WORDS:
+        has_lyrics = NO_LYRICS
+    elif has_lyrics_raw:
+        has_lyrics = clean(str(form.get("has_lyrics", ""))).strip()
+    else:
+        has_lyrics = ""
+        errors += 1
+    nick = clean(str(form.get("nick", ""))).strip()
+    errors += not nick
+    fio = clean(str(form.get("fio", ""))).strip()
+    errors += not fio
+    date_text = clean(str(form.get("date", ""))).strip()
+    if not date_text:
+        errors += 1
+    else:
+        try:
+            date_obj = datetime.strptime(date_text, "%d.%m.%Y")
+            min_days = 7 if release_type == ALBUM else 3
+            errors += date_obj < datetime.now() + timedelta(days=min_days)
+        except ValueError:
+            errors += 1
+    version = clean(str(form.get("version", ""))).strip()
+    if not version or version == "-":
+        version = ORIGINAL
+    genre = clean(str(form.get("genre", ""))).strip()
+    errors += not genre
+    link = clean(str(form.get("link", ""))).strip()
+    errors += not link or not old_looks_like_url(link)
+    yandex = clean(str(form.get("yandex", ""))).strip()
+    if not yandex or yandex in YANDEX_BLANK:
+        yandex = "."
+    errors += yandex != "." and not old_looks_like_url(yandex)
+    mat_raw = clean(str(form.get("mat", ""))).strip().lower()
+    mat = YES if mat_raw in YES_WORDS else NO if mat_raw in NO_WORDS else ""
+    errors += not mat
+    promo = old_optional(form.get("promo"), ".")
+    comment = old_optional(form.get("comment"), ".")
+    tracklist = old_optional(form.get("tracklist"), ".")
+    tg_contact = clean(str(form.get("tg", ""))).strip()
+    errors += not tg_contact
+    errors += release_type == ALBUM and tracklist == "."
+    data = {
+        "type": release_type, "name": name, "subname": subname, "has_lyrics": has_lyrics, "nick": nick,
+        "fio": fio, "date": date_text, "version": version, "genre": genre, "link": link, "yandex": yandex,
+        "mat": mat, "promo": promo, "comment": comment, "tracklist": tracklist, "tg": tg_contact,
+    }
+    if release_type != ALBUM:
+        data.pop("tracklist", None)
+    return data, errors
+
+
+def new_validate(form: dict, action: str, now=None) -> tuple[dict, list]:
+    if action == "submit_release" or main.RELEASE_SCHEMA.is_legacy(form):
+        form = main.RELEASE_SCHEMA.from_legacy(form)
+    return main.RELEASE_SCHEMA.validate(form, now)
+
+
+def generate(n: int, legacy_share: float, invalid_share: float, seed: int) -> list[tuple[dict, str]]:
+    rnd = random.Random(seed)
+    today = datetime.now()
+    genres = ("phonk", "Brazilian Funk", "Hip-Hop", "Trap", "EDM", "  drill  ")
+    out = []
+    for i in range(n):
+        release_date = today + timedelta(days=rnd.randint(1, 60))
+        album = rnd.random() < 0.2
+        if rnd.random() < legacy_share:
+            form = {
+                "track_title": f"Track {i}", "artist_name": f"artist {i % 997}",
+                "release_date": release_date.strftime("%Y-%m-%d"), "genre": rnd.choice(genres),
+                "files_link": f"https://drive.google.com/d/{i}", "telegram_contact": f"@artist{i}",
+                "release_type": "album" if album else "single", "lyrics": rnd.choice(("yes", "no", "")),
+            }
+            if album and rnd.random() < 0.7:
+                form["tracklist"] = "1. intro 2. outro"
+            action = rnd.choice(("submit_release", "webapp_release_submit"))
+        else:
+            form = {
+                "type": rnd.choice(("album", "Album", " album ") if album else ("single", "singl", "Single")),
+                "name": f"Release {i}", "subname": rnd.choice((".", "", "Remix")),
+                "has_lyrics": rnd.choice(("yes", "no", "Y", "instrumental", "feat. vocals")),
+                "nick": f"artist {i % 997}", "fio": "Ivanov Ivan", "date": release_date.strftime("%d.%m.%Y"),
+                "version": rnd.choice(("-", "", "Slowed")), "genre": rnd.choice(genres),
+                "link": f"https://drive.google.com/d/{i}", "yandex": rnd.choice((".", "-", "none", f"https://music.yandex.ru/artist/{i}")),
+                "mat": rnd.choice(("yes", "no", "N", "No")), "promo": ".", "comment": rnd.choice((".", "", "first release")),
+                "tracklist": "Track A, Track B" if album and rnd.random() < 0.7 else ".", "tg": f"@artist{i}",
+            }
+            action = "webapp_release_submit"
+        if rnd.random() < invalid_share:
+            broken = rnd.choice(("date", "link", "yandex", "name", "mat", "type"))
+            bad = {"date": "31.02.2030", "link": "drive.google.com/x", "yandex": "yandex", "name": "", "mat": "maybe", "type": "ep"}[broken]
+            key = {"date": "release_date", "link": "files_link", "name": "track_title"}.get(broken, broken) if "track_title" in form else broken
+            form[key] = bad
+        out.append((form, action))
+    return out
+
+
+def best_of(repeat: int, run) -> tuple[list, float]:
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        result = run()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main_cli():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--payloads", type=int, default=100_000)
+    ap.add_argument("--legacy-share", type=float, default=0.25, help="share of flat payloads from old Mini App builds")
+    ap.add_argument("--invalid-share", type=float, default=0.2, help="share of payloads with one broken field")
+    ap.add_argument("--repeat", type=int, default=3, help="best of N runs")
+    ap.add_argument("--seed", type=int, default=1234)
+    args = ap.parse_args()
+
+    payloads = generate(args.payloads, args.legacy_share, args.invalid_share, args.seed)
+
+    before, t_before = best_of(args.repeat, lambda: [old_validate(form, action) for form, action in payloads])
+    after, t_after = best_of(args.repeat, lambda: [new_validate(form, action) for form, action in payloads])
+
+    def batch_run():
+        forms = [
+            main.RELEASE_SCHEMA.from_legacy(form) if action == "submit_release" or main.RELEASE_SCHEMA.is_legacy(form) else form
+            for form, action in payloads
+        ]
+        return main.RELEASE_SCHEMA.validate_many(forms)
+
+    batch, t_batch = best_of(args.repeat, batch_run)
+
+    mismatches = sum(
+        1 for (old_data, old_errors), (new_data, new_errors) in zip(before, after)
+        if (old_errors or new_errors) and bool(old_errors) != bool(new_errors) or (not old_errors and old_data != new_data)
+    )
+    error_counts = sum(1 for (_, old_errors), (_, new_errors) in zip(before, after) if old_errors != len(new_errors))
+    rejected = sum(1 for _, errors in after if errors)
+    assert [errors for _, errors in batch] == [errors for _, errors in after]
+
+    n = args.payloads
+    print(f"payloads={n} legacy={args.legacy_share:.0%} invalid={args.invalid_share:.0%} rejected={rejected}")
+    print(f"{'':<14}{'total s':>9}{'us/form':>9}{'forms/s':>11}")
+    for name, elapsed in (("before", t_before), ("after", t_after), ("after batch", t_batch)):
+        print(f"{name:<14}{elapsed:>9.3f}{elapsed / n * 1e6:>9.2f}{n / elapsed:>11.0f}")
+    print(f"speedup: {t_before / t_after:.2f}x per form, {t_before / t_batch:.2f}x batch")
+    print(f"mismatches: {mismatches} accepted forms differ, {error_counts} forms with a different error count")
+    assert mismatches == 0 and error_counts == 0
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""Micro-benchmark: moderation card / status / artist notice rendering, before vs after.
+
+Запуск: python benchmarks/bench_render.py [--number 20000]
+
+«before» — копия прежней реализации (цепочка str.replace, словари статусов на каждый вызов,
+f-строки уведомлений), «after» — прекомпилированные шаблоны и кэш карточек из main.py.
+"""
+import argparse
+import timeit
+from datetime import datetime
+
+from _bootstrap import import_main
+
+main = import_main()
+
+RELEASE = {
+    "type": "сингл",
+    "name": "Northern <Lights> & Co",
+    "subname": "",
+    "nick": "artist \"x\"",
+    "fio": "Иванов Иван Иванович",
+    "date": "01.02.2026",
+    "version": "Original",
+    "genre": "Pop",
+    "link": "https://example.com/files?a=1&b=2",
+    "yandex": ".",
+    "mat": "нет",
+    "promo": "",
+    "comment": "",
+    "tg": "@artist",
+    "upc": "5099994682101",
+}
+
+
+class _User:
+    username = "artist"
+
+
+# --- прежняя реализация ---------------------------------------------------------
+
+def legacy_escape_html(text):
+    if not text:
+        return ""
+    return (str(text)
+            .replace('&', '&amp;')
+            .replace('<', '&lt;')
+            .replace('>', '&gt;')
+            .replace('"', '&quot;'))
+
+
+def legacy_card(user, user_id, data):
+    username = f"@{user.username}" if user and user.username else "нет"
+    release_type = data.get("type", "—")
+    lines = [
+        "🎵 <b>НОВАЯ АНКЕТА!</b>",
+        f"От: {legacy_escape_html(username)}",
+        f"ID: <code>{legacy_escape_html(user_id)}</code>",
+        f"Тип: {legacy_escape_html(release_type)}",
+        "",
+    ]
+    upc = data.get("upc")
+    if upc:
+        lines.append(f"📦 <b>UPC:</b> <code>{legacy_escape_html(upc)}</code>")
+        lines.append("")
+
+    def add(label, key, default="—"):
+        val = data.get(key)
+        if val is None or str(val).strip() == "":
+            val = default
+        lines.append(f"• <b>{label}:</b> {legacy_escape_html(val)}")
+    add("Название", "name")
+    add("Саб-название", "subname", ".")
+    add("Ник", "nick")
+    add("ФИО", "fio")
+    add("Дата", "date")
+    add("Версия", "version")
+    add("Жанр", "genre")
+    add("Ссылка", "link")
+    add("Яндекс Музыка", "yandex", ".")
+    add("Мат", "mat")
+    add("Промо", "promo", ".")
+    add("Комментарий", "comment", ".")
+    if data.get("type") == "альбом":
+        add("Tracklist", "tracklist")
+    add("Tg", "tg")
+    return "\n".join(lines)
+
+
+def legacy_status_header(status):
+    status_short = {
+        "on_upload": "На отгрузке",
+        "moderation": "На модерации",
+        "approved": "Одобрено",
+        "rejected": "Отклонено",
+        "needs_fix": "Требует правок",
+        "deleted": "Удалено",
+    }.get(status, status)
+    emoji = {
+        "on_upload": "🕓",
+        "moderation": "🧠",
+        "approved": "✅",
+        "rejected": "❌",
+        "needs_fix": "⚠️",
+        "deleted": "🗑",
+    }.get(status, '')
+    return f"{emoji} <b>СТАТУС: {legacy_escape_html(status_short)}</b>\n\n"
+
+
+def legacy_notice(release, moderator_name):
+    moderation_time = datetime.now().strftime("%d.%m.%Y в %H:%M")
+    return (
+        f"✅ <b>ВАШ РЕЛИЗ ОДОБРЕН!</b>\n\n"
+        f"📝 <b>{legacy_escape_html(release.get('name', '—'))}</b>\n"
+        f"🎵 <i>Тип:</i> {legacy_escape_html(release.get('type', '—'))}\n"
+        f"📅 <i>Дата релиза:</i> {legacy_escape_html(release.get('date', '—'))}\n"
+        f"👤 <i>Артист:</i> {legacy_escape_html(release.get('nick', '—'))}\n"
+        f"🕐 <i>Одобрено:</i> {legacy_escape_html(moderation_time)}\n"
+        f"👨‍💼 <i>Модератор:</i> @{legacy_escape_html(moderator_name)}\n\n"
+        f"✨ Готов к публикации на всех платформах!"
+    )
+
+
+# --- замеры ---------------------------------------------------------------------
+
+def _bench(fn, number):
+    best = min(timeit.repeat(fn, number=number, repeat=5))
+    return best / number * 1e6
+
+
+def main_cli():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--number", type=int, default=20000)
+    args = ap.parse_args()
+    n = args.number
+    user = _User()
+    text = RELEASE["link"] + RELEASE["name"] * 4
+
+    cases = [
+        ("escape_html", lambda: legacy_escape_html(text), lambda: main.escape_html(text)),
+        ("release card", lambda: legacy_card(user, "123456", RELEASE),
+         lambda: main._format_release_form_for_group(user, "123456", RELEASE)),
+        ("release card (cached)", lambda: legacy_card(user, "123456", RELEASE),
+         lambda: main._cached_release_card(user, "123456", 0, RELEASE)),
+        ("status header", lambda: legacy_status_header(main.STATUS_APPROVED),
+         lambda: main._status_header(main.STATUS_APPROVED)),
+        ("artist notice", lambda: legacy_notice(RELEASE, "moder"),
+         lambda: main._render_artist_status_notice(RELEASE, main.STATUS_APPROVED, "moder")),
+    ]
+    print(f"{'case':<24}{'before, us':>12}{'after, us':>12}{'speedup':>10}")
+    for name, before, after in cases:
+        b = _bench(before, n)
+        a = _bench(after, n)
+        print(f"{name:<24}{b:>12.2f}{a:>12.3f}{b / a:>9.1f}x")
+
+    # инвалидация: после мутации карточка рендерится заново
+    first = main._cached_release_card(user, "123456", 0, RELEASE)
+    changed = dict(RELEASE, upc="0000000000000")
+    main._mark_release_changed("123456", 0)
+    assert main._cached_release_card(user, "123456", 0, changed) != first
+
+
+if __name__ == "__main__":
+    main_cli()
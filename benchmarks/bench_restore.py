@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""Point-in-time restore on a 100k-release DB: sequential log replay vs the last value per key.
+
+Запуск: python benchmarks/bench_restore.py [--releases 100000] [--actions 20000] [--seed 1234]
+
+Полный архив, затем «день модерации»: --actions смен статуса (релиз, сообщение модерации,
+история), каждая пишется в MUTATIONS так же, как это делают save_*, и в конце /cleanbase.
+Замеряется: цена записи в журнал на одно действие, восстановление на середину дня двумя
+способами — «before» проигрывает каждую запись журнала по порядку поверх архива, «after»
+(restore_state) берёт только последнее значение каждого ключа, — точечное восстановление
+одного пользователя (restore_record) и пробный прогон после /cleanbase. Все варианты
+сверяются с состоянием, сохранённым в середине дня; /restore ... apply возвращает релиз,
+apply_restored_state — базу после /cleanbase.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
+
+import datagen
+import tg_stubs
+from _bootstrap import import_main
+
+workdir = tempfile.mkdtemp(prefix="cxner-bench-restore-")
+main = import_main(workdir)
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else float("nan")
+
+
+def copy_state(history: dict) -> dict:
+    return {
+        "db": json.loads(json.dumps(main.db)),
+        "moderation_db": json.loads(json.dumps(main.moderation_db)),
+        "history": json.loads(json.dumps(history)),
+    }
+
+
+def moderation_day(history: dict, actions: int, start: float, seed: int) -> tuple[list, dict, float]:
+    """Status changes logged as save_* would log them; returns (journal seconds per action, mid state, mid time)."""
+    rnd = random.Random(seed)
+    uids = list(main.db)
+    messages = main.moderation_db["moderation_messages"]
+    position = {(m["user_id"], m["submission_time"]): n for n, m in enumerate(messages)}
+    costs, mid, mid_at = [], None, None
+    step = 86400 / actions
+    for n in range(actions):
+        at = start + (n + 1) * step
+        uid = rnd.choice(uids)
+        idx = rnd.randrange(len(main.db[uid]))
+        release = main.db[uid][idx]
+        old = release["status"]
+        release["status"] = rnd.choice(("approved", "rejected", "needs_fix", "moderation"))
+        release["moderator"] = "mod_bench"
+        release["moderation_time"] = datetime.fromtimestamp(at).isoformat()
+        history.setdefault(f"{uid}_{idx}", []).append({
+            "timestamp": release["moderation_time"], "old_status": old, "new_status": release["status"],
+            "moderator_id": 1, "moderator_name": "mod_bench", "reason": None,
+        })
+        msg_n = position[(uid, release["submission_time"])]
+        messages[msg_n]["status"] = release["status"]
+        t0 = time.perf_counter()
+        main._mark_release_changed(uid, idx)
+        main.MUTATIONS.record("db", main.db, at)
+        main.MUTATIONS.touch("moderation_db", msg_n)
+        main.MUTATIONS.record("moderation_db", main.moderation_db, at)
+        main.MUTATIONS.touch("history", f"{uid}_{idx}")
+        main.MUTATIONS.record("history", history, at)
+        costs.append(time.perf_counter() - t0)
+        if n + 1 == actions // 2:
+            mid, mid_at = copy_state(history), at
+    return costs, mid, mid_at
+
+
+def sequential_replay(items: dict, since: float, until: float) -> int:
+    """The straightforward replay: every logged change after the archive, in order, parsed one by one."""
+    applied = 0
+    with contextlib.closing(sqlite3.connect(main.MUTATIONS.path)) as conn:
+        for store, key, value in conn.execute(
+            "SELECT store, key, value FROM mutations WHERE at > ? AND at <= ? ORDER BY seq", (since, until)
+        ):
+            if value is None:
+                items[store].pop(key, None)
+            else:
+                items[store][key] = json.loads(value)
+            applied += 1
+    return applied
+
+
+def last_value_replay(items: dict, since: float, until: float) -> int:
+    return sum(main.replay_changes(items[store], store, since, until) for store in items)
+
+
+def rebuild(items: dict) -> dict:
+    return {store: main.BackupManager._from_items(records, main.MutationLog.STORES[store]) for store, records in items.items()}
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - t0
+
+
+async def restore_command(args: list[str]) -> str:
+    bot = tg_stubs.StubBot()
+    update = tg_stubs.message_update(bot, main.ADMIN_IDS[0], text="/restore " + " ".join(args))
+    with contextlib.redirect_stdout(io.StringIO()):
+        await main.restore_cmd(update, tg_stubs.context(bot, args=args))
+    return bot.calls[-1][1]["text"]
+
+
+def main_cli():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--releases", type=int, default=100_000)
+    ap.add_argument("--actions", type=int, default=20_000, help="status changes logged between the archive and /cleanbase")
+    ap.add_argument("--seed", type=int, default=1234)
+    args = ap.parse_args()
+
+    data = datagen.generate(args.releases, args.seed)
+    datagen.write(workdir, data, main)
+    main.db.update(data["db"])
+    main.moderation_db.update(data["moderation_db"])
+    history = data["history"]
+    main.MUTATIONS = main.MutationLog(os.path.join(workdir, "mutations-bench.sqlite3"))
+    main.MUTATIONS.warm({
+        "db": list(main.db),
+        "moderation_db": [str(n) for n in range(len(main.moderation_db["moderation_messages"]))],
+        "history": list(history),
+    })
+    main.BACKUPS = main.BackupManager(os.path.join(workdir, "backups"), 0, 24 * 3600, 7, "auto")
+    with contextlib.redirect_stdout(io.StringIO()):
+        asyncio.run(main.BACKUPS.backup(kind="full"))
+    start = main.BACKUPS.taken_at(main.BACKUPS.archives()[-1][2])
+
+    costs, mid, mid_at = moderation_day(history, args.actions, start, args.seed)
+    # /cleanbase в конце дня: база пустая, на диске тоже
+    wipe_at = start + 86400 + 1
+    main.db.clear()
+    main.MUTATIONS.touch("db")
+    wiped = main.MUTATIONS.record("db", main.db, wipe_at)
+    main._atomic_write_json(main.DB_FILE, main.db)
+    main._atomic_write_json(main.MODERATION_DB_FILE, main.moderation_db)
+    main._atomic_write_json(main.HISTORY_FILE, history)
+    with contextlib.closing(sqlite3.connect(main.MUTATIONS.path)) as conn:
+        logged = conn.execute("SELECT COUNT(*) FROM mutations").fetchone()[0]
+
+    print(f"releases={args.releases} actions={args.actions} log entries={logged} (/cleanbase: {wiped} users deleted)")
+    print(f"journal per action (db + moderation + history): p50 {percentile(costs, 0.5) * 1e6:.0f} us, p99 {percentile(costs, 0.99) * 1e6:.0f} us")
+
+    name, taken = main.BACKUPS.archive_at(mid_at)
+    loaded, load_s = timed(main.BACKUPS.load, name, main.RESTORE_STORES)
+    base = {store: main.BackupManager._items(loaded[store], main.MutationLog.STORES[store]) for store in main.RESTORE_STORES}
+    replays = {}
+    for label, replay in (("before (every row in order)", sequential_replay), ("after (last value per key)", last_value_replay)):
+        items = {store: dict(records) for store, records in base.items()}
+        rows, seconds = timed(replay, items, taken, mid_at)
+        assert rebuild(items) == mid, f"{label}: state differs from the one saved at mid-day"
+        replays[label] = (rows, seconds)
+    (state, info), total_s = timed(main.restore_state, mid_at)
+    assert state == mid, "restore_state differs from the mid-day state"
+    applied = replays["before (every row in order)"][0]
+    print(f"restore to mid-day: archive load {load_s:.2f} s, restore_state total {total_s:.2f} s")
+    print(f"{'log replay':<30}{'seconds':>9}{'rows read':>11}{'log rows/s':>12}")
+    for label, (rows, seconds) in replays.items():
+        print(f"{label:<30}{seconds:>9.3f}{rows:>11}{applied / seconds:>12.0f}")
+    print("both match the state saved at mid-day")
+
+    changed_uid = next(uid for uid in mid["db"] if main.MUTATIONS.value_at("db", uid, mid_at) is not None)
+    untouched_uid = next(uid for uid in mid["db"] if main.MUTATIONS.value_at("db", uid, mid_at) is None)
+    (found, value), logged_s = timed(main.restore_record, mid_at, "db", changed_uid)
+    assert found and value == mid["db"][changed_uid]
+    (found, value), archive_s = timed(main.restore_record, mid_at, "db", untouched_uid)
+    assert found and value == mid["db"][untouched_uid]
+    print(f"restore_record: changed user {logged_s * 1000:.2f} ms (log), unchanged user {archive_s * 1000:.0f} ms (archive)")
+
+    when = datetime.fromtimestamp(mid_at)
+    at_args = [when.strftime("%d.%m.%Y"), when.strftime("%H:%M:%S")]
+    (_, _, diffs), plan_s = timed(main.plan_restore, mid_at)
+    print(f"dry run after /cleanbase: {plan_s:.2f} s, db would get back {len(diffs['db']['add'])} users")
+    assert main.restore_state(wipe_at, ("db",))[0]["db"] == {}, "restore after /cleanbase brought users back"
+    text = asyncio.run(restore_command(at_args))
+    assert "apply" in text, text
+
+    idx = 0
+    asyncio.run(restore_command(at_args + [f"{changed_uid}_{idx}", "apply"]))
+    target = json.loads(json.dumps(main.restore_record(int(mid_at), "db", changed_uid)[1][idx]))
+    assert main.db[changed_uid][idx] == target, "/restore apply did not put the release back"
+    print(f"/restore {' '.join(at_args)} {changed_uid}_{idx} apply: release is back")
+
+    state, _ = main.restore_state(wipe_at - 1)
+    with contextlib.redirect_stdout(io.StringIO()):
+        main.apply_restored_state(state)
+    assert len(main.db) == len(state["db"]) and main.load_db() == state["db"]
+    print(f"apply_restored_state: {len(main.db)} users back after /cleanbase")
+
+
+if __name__ == "__main__":
+    main_cli()
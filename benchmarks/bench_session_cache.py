@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""Bounded user_data: memory, hit ratio and evictions under a skewed stream of form steps.
+
+Запуск: python benchmarks/bench_session_cache.py [--users 20000] [--updates 100000] [--max-size 2000]
+
+Каждый апдейт идёт тем же путём, что в боте: SESSIONS.restore() (группа -2), шаг анкеты
+через push_history() и запись поля, SESSIONS.mark_dirty(); раз в --flush-every апдейтов —
+SESSIONS.flush(). Активность пользователей распределена по Ципфу: немногие заполняют
+анкету долго, большинство заходит на пару шагов. Сравниваются неограниченный user_data
+(как раньше) и SessionCache с --max-size; в конце все черновики сверяются с теневой
+копией — вытеснение не должно терять ни полей, ни истории /undo, ни состояния диалога.
+"""
+import argparse
+import json
+import random
+import tempfile
+import time
+import tracemalloc
+
+import datagen
+from _bootstrap import import_main
+
+workdir = tempfile.mkdtemp(prefix="cxner-bench-session-cache-")
+main = import_main(workdir)
+
+FIELDS = ("name", "subname", "nick", "fio", "date", "version", "genre", "link", "yandex", "promo", "comment", "tracklist")
+
+
+def as_json(obj):
+    return json.loads(json.dumps(obj, ensure_ascii=False, default=main._session_json_default))
+
+
+def run(args, max_size: int) -> dict:
+    main.SESSIONS.close()
+    main.SESSIONS = main.SessionStore(f"sessions-{max_size}.sqlite3")
+    main.user_data.clear()
+    main.user_data.max_size = max_size
+    hits0, misses0 = main.user_data.hits.value, main.user_data.misses.value
+    evictions0 = main.METRICS.counter("bot_session_cache_evictions_total", reason="size").value
+
+    rnd = random.Random(args.seed)
+    weights = [1 / (rank + 1) ** args.skew for rank in range(args.users)]
+    users = [str(300000000 + n) for n in range(args.users)]
+    stream = rnd.choices(users, weights=weights, k=args.updates)
+    shadow: dict[str, dict] = {}
+    steps = []
+
+    tracemalloc.start()
+    t_all = time.perf_counter()
+    for n, user_id in enumerate(stream, 1):
+        t0 = time.perf_counter()
+        main.SESSIONS.restore(user_id)
+        draft = main.user_data.get(user_id)
+        if draft is None:
+            draft = main.user_data[user_id] = {"type": "single", "status": "pending"}
+        field = rnd.choice(FIELDS)
+        main.push_history(user_id, field)
+        draft[field] = " ".join(rnd.choice(datagen.WORDS) for _ in range(rnd.randint(1, 6)))
+        main.SESSIONS.set_state(user_id, int(user_id), 4)
+        main.SESSIONS.mark_dirty(user_id)
+        steps.append(time.perf_counter() - t0)
+        shadow[user_id] = as_json(draft)
+        if n % args.flush_every == 0:
+            main.SESSIONS.flush()
+    main.SESSIONS.flush()
+    elapsed = time.perf_counter() - t_all
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    in_memory = main.user_data.measure()
+
+    # сверка: каждый черновик восстанавливается из памяти, spilled или базы без потерь
+    lost = 0
+    for user_id, expected in shadow.items():
+        main.SESSIONS.restore(user_id)
+        got = main.user_data.get(user_id)
+        if got is None or as_json(got) != expected or main.SESSIONS._states.get(user_id) != {user_id: 4}:
+            lost += 1
+        if len(main.user_data) >= max_size:
+            main.SESSIONS.flush()
+
+    steps.sort()
+    hits = main.user_data.hits.value - hits0
+    misses = main.user_data.misses.value - misses0
+    return {
+        "max_size": max_size,
+        "drafts": len(shadow),
+        "elapsed_s": elapsed,
+        "step_p50_us": steps[len(steps) // 2] * 1e6,
+        "step_p99_us": steps[int(len(steps) * 0.99)] * 1e6,
+        "hit_ratio": hits / max(1, hits + misses),
+        "evictions": main.METRICS.counter("bot_session_cache_evictions_total", reason="size").value - evictions0,
+        "cache_mb": in_memory / 1e6,
+        "peak_mb": peak / 1e6,
+        "lost": lost,
+    }
+
+
+def check_ttl() -> bool:
+    main.user_data.clear()
+    main.user_data.max_size = 100
+    main.user_data.idle_ttl = 0.05
+    main.SESSIONS.restore("1")
+    main.user_data["1"] = {"type": "single", "name": "idle"}
+    main.push_history("1", "name")
+    main.SESSIONS.set_state("1", 1, 7)
+    time.sleep(0.1)
+    evicted = main.user_data.expire()
+    spilled = "1" in main.SESSIONS._spilled and "1" not in main.user_data
+    main.SESSIONS.restore("1")
+    back = main.user_data.get("1", {}).get("name") == "idle" and as_json(main.user_data["1"]["_history"]) == [["name", "idle"]]
+    return evicted == 1 and spilled and back and main.SESSIONS._states.get("1") == {"1": 7}
+
+
+def main_cli():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--users", type=int, default=20000)
+    ap.add_argument("--updates", type=int, default=100000)
+    ap.add_argument("--max-size", type=int, default=2000)
+    ap.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of user activity")
+    ap.add_argument("--flush-every", type=int, default=500, help="updates between SESSIONS.flush() calls")
+    ap.add_argument("--seed", type=int, default=1234)
+    args = ap.parse_args()
+
+    rows = [run(args, args.users + 1), run(args, args.max_size)]
+    print(f"users={args.users} updates={args.updates} skew={args.skew} history_limit={main.SESSION_HISTORY_LIMIT}")
+    print(f"{'max_size':>9}{'drafts':>8}{'hit%':>8}{'evict':>8}{'cache MB':>10}{'peak MB':>9}{'p50 us':>8}{'p99 us':>8}{'lost':>6}")
+    for r in rows:
+        print(
+            f"{r['max_size']:>9}{r['drafts']:>8}{r['hit_ratio'] * 100:>8.1f}{r['evictions']:>8}{r['cache_mb']:>10.2f}"
+            f"{r['peak_mb']:>9.2f}{r['step_p50_us']:>8.1f}{r['step_p99_us']:>8.1f}{r['lost']:>6}"
+        )
+    print(f"idle TTL spill/restore: {'ok' if check_ttl() else 'FAILED'}")
+    if any(r["lost"] for r in rows):
+        raise SystemExit("drafts lost after eviction")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""Flush and restore cost of the session store with thousands of in-flight drafts.
+
+Запуск: python benchmarks/bench_sessions.py [--drafts 5000] [--active 50] [--repeat 5]
+
+Раньше save_draft_for_user на каждом шаге анкеты перечитывал и целиком переписывал
+drafts.json со всеми черновиками, а состояние ConversationHandler вообще не сохранялось.
+Сейчас шаг только помечает пользователя грязным, а SESSIONS.flush() раз в интервал пишет
+изменившиеся строки в SQLite. Сравниваются: старый шаг анкеты, холодный flush всех черновиков,
+типичный flush (--active пользователей сделали по шагу), flush без изменений и ленивое
+восстановление одного пользователя после рестарта.
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+import datagen
+from _bootstrap import import_main
+
+workdir = tempfile.mkdtemp(prefix="cxner-bench-sessions-")
+main = import_main(workdir)
+
+LEGACY_DRAFTS_FILE = "drafts.json"
+FORM_STATE = 7  # произвольное состояние диалога посреди анкеты
+
+
+def make_drafts(count: int, seed: int) -> dict:
+    rnd = random.Random(seed)
+    drafts = {}
+    for n in range(count):
+        album = rnd.random() < 0.2
+        draft = {
+            "type": "альбом" if album else "сингл",
+            "status": "pending",
+            "name": " ".join(rnd.choice(datagen.WORDS).capitalize() for _ in range(2)),
+            "subname": ".",
+            "nick": f"artist_{n}",
+            "fio": "Иванов Иван Иванович",
+            "date": "01.03.2025",
+            "genre": rnd.choice(datagen.GENRES),
+            "link": f"https://drive.google.com/drive/folders/{rnd.getrandbits(64):016x}",
+        }
+        if album:
+            draft["tracklist"] = "\n".join(f"{t + 1}. {rnd.choice(datagen.WORDS)}" for t in range(rnd.randint(4, 12)))
+        draft["_history"] = [(field, None) for field in ("name", "nick", "fio", "date", "genre", "link")[: rnd.randint(1, 6)]]
+        drafts[str(200000000 + n)] = draft
+    return drafts
+
+
+def legacy_step(user_id: str) -> None:
+    # прежняя реализация save_draft_for_user
+    drafts = main._load_json_or_default(LEGACY_DRAFTS_FILE, {})
+    drafts[user_id] = {k: v for k, v in main.user_data.get(user_id, {}).items() if not k.startswith("_")}
+    drafts[user_id]["saved_at"] = "2025-01-01T12:00:00"
+    main._atomic_write_json(LEGACY_DRAFTS_FILE, drafts)
+
+
+def timed(fn) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+def best_of(fn, repeat: int, before=None) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        if before:
+            before()
+        best = min(best, timed(fn))
+    return best
+
+
+def main_cli():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--drafts", type=int, default=5000)
+    ap.add_argument("--active", type=int, default=50, help="users that advanced one step between flushes")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=1234)
+    args = ap.parse_args()
+
+    drafts = make_drafts(args.drafts, args.seed)
+    users = list(drafts)
+    # здесь меряется только store, вытеснение из user_data — в bench_session_cache.py
+    main.user_data.max_size = len(drafts) + 1
+    main.user_data.clear()
+    main.user_data.update(drafts)
+    for user_id in users:
+        main.SESSIONS.set_state(user_id, int(user_id), FORM_STATE)
+
+    # старый путь: drafts.json со всеми черновиками уже на диске, пользователь делает один шаг
+    main._atomic_write_json(LEGACY_DRAFTS_FILE, {u: {k: v for k, v in d.items() if not k.startswith("_")} for u, d in drafts.items()})
+    legacy = best_of(lambda: legacy_step(users[0]), args.repeat)
+
+    cold = timed(main.SESSIONS.flush)
+    rnd = random.Random(args.seed)
+
+    def advance_active():
+        for user_id in rnd.sample(users, args.active):
+            main.user_data[user_id]["comment"] = f"step {rnd.random()}"
+            main.SESSIONS.mark_dirty(user_id)
+
+    typical = best_of(main.SESSIONS.flush, args.repeat, before=advance_active)
+
+    def touch_all():
+        for user_id in users:
+            main.SESSIONS.mark_dirty(user_id)
+
+    unchanged = best_of(main.SESSIONS.flush, args.repeat, before=touch_all)
+    collect_only = best_of(lambda: main.SESSIONS.collect(), args.repeat, before=advance_active)
+    main.SESSIONS.flush()
+    main.SESSIONS._writer.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    # рестарт: новый процесс видит пустой user_data и читает строки по одной при первом апдейте
+    expected = json.loads(json.dumps(main.user_data[users[-1]], ensure_ascii=False))
+    main.SESSIONS.close()
+    main.user_data.clear()
+    restored = main.SessionStore(main.SESSION_STORE_FILE)
+    sample = rnd.sample(users, min(1000, len(users)))
+    t0 = time.perf_counter()
+    for user_id in sample:
+        restored.restore(user_id)
+    restore_each = (time.perf_counter() - t0) / len(sample)
+    restored.restore(users[-1])
+    # _history возвращается кольцевым буфером (deque), сравниваем JSON-представления
+    assert json.loads(json.dumps(main.user_data[users[-1]], ensure_ascii=False, default=main._session_json_default)) == expected, "restored draft differs"
+    assert restored._states[users[-1]] == {users[-1]: FORM_STATE}, restored._states.get(users[-1])
+
+    db_size = sum(os.path.getsize(p) for p in (main.SESSION_STORE_FILE, main.SESSION_STORE_FILE + "-wal") if os.path.exists(p))
+    json_size = os.path.getsize(LEGACY_DRAFTS_FILE)
+    print(f"drafts={args.drafts} active={args.active}")
+    print(f"{'legacy: one form step (drafts.json)':<44}{legacy * 1000:>10.2f} ms")
+    print(f"{'flush: all drafts, cold':<44}{cold * 1000:>10.2f} ms")
+    print(f"{'flush: active users changed':<44}{typical * 1000:>10.2f} ms")
+    print(f"{'  of which collect() on the loop':<44}{collect_only * 1000:>10.2f} ms")
+    print(f"{'flush: all touched, nothing changed':<44}{unchanged * 1000:>10.2f} ms")
+    print(f"{'restore: one user after restart':<44}{restore_each * 1e6:>10.1f} us")
+    print(f"{'size: sessions.sqlite3 vs drafts.json':<44}{db_size / 1e6:>8.2f} MB vs {json_size / 1e6:.2f} MB (no _history/state)")
+
+
+if __name__ == "__main__":
+    main_cli()
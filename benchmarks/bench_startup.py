@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""Startup cost of the JSON stores: import-time legacy path vs background load_stores().
+
+Запуск: python benchmarks/bench_startup.py [--releases 20000] [--repeat 5]
+
+До изменений main.py при импорте последовательно читал releases.json, moderation_releases.json
+и cabinet_users.json и сразу же переписывал оба экспорта Mini App — всё это до старта polling.
+Сейчас на критическом пути только параллельная загрузка JSON, экспорт уходит в фон. Время до первого апдейта в живом боте — флаг --measure-startup.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import datagen
+from _bootstrap import REPO_ROOT, import_main
+
+workdir = tempfile.mkdtemp(prefix="cxner-bench-startup-")
+main = import_main(workdir)
+
+
+def write_stores(releases: int, seed: int = 1234) -> None:
+    datagen.write(workdir, datagen.generate(releases, seed), main)
+
+
+def legacy_import_path() -> None:
+    db = main.load_db()
+    main.load_moderation_db()
+    cabinet = main.load_cabinet_users()
+    main._export_webapp_releases(db)
+    main._export_webapp_cabinet_users(cabinet)
+
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def import_time() -> float:
+    code = "import time; t0 = time.perf_counter(); import main; print(time.perf_counter() - t0)"
+    env = dict(os.environ, ENABLE_WEB_SERVER="0", PYTHONPATH=REPO_ROOT)
+    out = subprocess.run([sys.executable, "-c", code], cwd=workdir, env=env, capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def main_cli():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--releases", type=int, default=20000)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+    write_stores(args.releases)
+    size = sum(os.path.getsize(os.path.join(workdir, p)) for p in (main.DB_FILE, main.MODERATION_DB_FILE, main.CABINET_USERS_FILE))
+    print(f"releases={args.releases} json={size / 1e6:.1f} MB")
+
+    legacy = best_of(legacy_import_path, args.repeat)
+    parallel = best_of(main.load_stores, args.repeat)
+    assert set(main._store_sources.values()) == {"json"}, main._store_sources
+    assert sum(len(v) for v in main.db.values()) == args.releases
+
+    print(f"{'legacy import-time load + exports':<40}{legacy * 1000:>10.1f} ms")
+    print(f"{'load_stores (json, parallel)':<40}{parallel * 1000:>10.1f} ms")
+    print(f"{'import main (stores not touched)':<40}{import_time() * 1000:>10.1f} ms")
+
+
+if __name__ == "__main__":
+    main_cli()
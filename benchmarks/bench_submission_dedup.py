@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""Mini App resubmissions: every payload becomes a release vs the SubmissionDedup TTL cache.
+
+Запуск: python benchmarks/bench_submission_dedup.py [--artists 100] [--retries 0.5] [--double-taps 0.3] [--latency-ms 80]
+
+Каждый артист отправляет анкету из Mini App. Доля --retries клиентов переотправляет тот же
+payload (тот же submitted_at — ретрай после таймаута), доля --double-taps жмёт «Отправить»
+второй раз (тот же form, новый submitted_at). Апдейты идут через UserSerializedUpdateProcessor,
+как в боте. «before» — дедупликации нет: каждый повтор проходит весь _submit_release_to_moderation
+(карточка, строка в базе, закреп). «after» — SUBMISSIONS: повтор получает исходный ответ.
+Отдельно: ключи переживают «рестарт» (новый экземпляр на том же файле), а повтор после
+SUBMISSION_DOUBLE_TAP_MS принимается как новая анкета.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import datagen
+import tg_stubs
+from _bootstrap import import_main
+
+workdir = tempfile.mkdtemp(prefix="cxner-bench-submission-dedup-")
+main = import_main(workdir)
+
+
+class SlowBot(tg_stubs.StubBot):
+    """Bot API stub with a fixed round trip for sends and pins."""
+
+    def __init__(self, latency: float):
+        super().__init__()
+        self.latency = latency
+
+    async def send_message(self, chat_id=None, text=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        return await super().send_message(chat_id, text, **kwargs)
+
+    async def pin_chat_message(self, chat_id=None, message_id=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        return await super().pin_chat_message(chat_id, message_id, **kwargs)
+
+
+class NoDedup:
+    """The old path: every payload is a new submission."""
+
+    def keys(self, user_id, submitted_at, release_data):
+        return []
+
+    def lookup(self, keys):
+        return None
+
+    def record(self, keys, result):
+        pass
+
+
+def payload(artist: int, submitted_at: str) -> str:
+    return json.dumps({
+        "action": "webapp_release_submit",
+        "submitted_at": submitted_at,
+        "form": {
+            "type": "single", "name": f"Retry {artist}", "subname": ".", "has_lyrics": "yes",
+            "nick": f"retry_{artist}", "fio": "Bench Bench", "version": "-", "genre": "phonk",
+            "date": (datetime.now() + timedelta(days=14)).strftime("%d.%m.%Y"),
+            "link": f"https://example.org/{artist}", "yandex": ".", "mat": "no", "promo": ".", "comment": ".",
+            "tg": f"@retry_{artist}",
+        },
+    })
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else float("nan")
+
+
+def reset() -> None:
+    datagen.write(workdir, {"db": {}, "moderation_db": {"moderation_messages": []}, "history": {}, "cabinet_users": {}}, main)
+    main.db.clear()
+    main.moderation_db["moderation_messages"].clear()
+    main._mark_all_releases_changed()
+
+
+def script(args, artist_base: int) -> list[tuple[int, list[str]]]:
+    """Per artist: the payloads the client sends, in order."""
+    rnd = random.Random(args.seed)
+    plan = []
+    for n in range(args.artists):
+        artist = artist_base + n
+        first = datetime.now().isoformat()
+        sends = [payload(artist, first)]
+        if rnd.random() < args.retries:
+            sends.append(payload(artist, first))
+        if rnd.random() < args.double_taps:
+            sends.append(payload(artist, (datetime.now() + timedelta(milliseconds=300)).isoformat()))
+        plan.append((artist, sends))
+    return plan
+
+
+async def run(args, dedup, artist_base: int) -> dict:
+    reset()
+    main.SUBMISSIONS = dedup
+    bot = SlowBot(args.latency_ms / 1000)
+    app = tg_stubs.StubApplication()
+    processor = main.UserSerializedUpdateProcessor(32)
+    plan = script(args, artist_base)
+    first_latency, repeat_latency = [], []
+
+    async def artist_sends(artist: int, sends: list[str]) -> None:
+        pending = []
+        for n, data in enumerate(sends):
+            update = tg_stubs.message_update(bot, artist, web_app_data=data)
+
+            async def one(update=update, n=n, t0=time.perf_counter()):
+                await processor.process_update(update, main.web_app_data_handler(update, tg_stubs.context(bot, application=app)))
+                (first_latency if n == 0 else repeat_latency).append(time.perf_counter() - t0)
+
+            # повтор прилетает, пока первая отправка ещё в работе
+            pending.append(asyncio.ensure_future(one()))
+            await asyncio.sleep(args.gap_ms / 1000)
+        await asyncio.gather(*pending)
+
+    t0 = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        await asyncio.gather(*(artist_sends(artist, sends) for artist, sends in plan))
+        await app.drain()
+    elapsed = time.perf_counter() - t0
+
+    artists = [str(artist) for artist, _ in plan]
+    return {
+        "payloads": sum(len(sends) for _, sends in plan),
+        "releases": sum(len(main.db.get(uid, [])) for uid in artists),
+        "cards": sum(1 for m, kw in bot.calls if m == "sendMessage" and kw.get("chat_id") == main.MODERATION_CHAT_ID),
+        "pins": sum(1 for m, _ in bot.calls if m == "pinChatMessage"),
+        "first_p50": percentile(first_latency, 0.5) * 1000,
+        "repeat_p50": percentile(repeat_latency, 0.5) * 1000,
+        "elapsed_s": elapsed,
+    }
+
+
+async def check_restart(path: str, artist: int) -> None:
+    reset()
+    bot = tg_stubs.StubBot()
+    data = payload(artist, datetime.now().isoformat())
+    ttl = main.SUBMISSION_DEDUP_TTL_HOURS * 3600
+    with contextlib.redirect_stdout(io.StringIO()):
+        main.SUBMISSIONS = main.SubmissionDedup(path, ttl, 0.2, main.SUBMISSION_DEDUP_MAX_KEYS)
+        await main.web_app_data_handler(tg_stubs.message_update(bot, artist, web_app_data=data), tg_stubs.context(bot))
+        main.SUBMISSIONS.close()
+        # «рестарт»: новый экземпляр читает ключи из файла
+        main.SUBMISSIONS = main.SubmissionDedup(path, ttl, 0.2, main.SUBMISSION_DEDUP_MAX_KEYS)
+        await main.web_app_data_handler(tg_stubs.message_update(bot, artist, web_app_data=data), tg_stubs.context(bot))
+        assert len(main.db[str(artist)]) == 1, "retry after restart created a second release"
+        # артист сознательно отправил ту же анкету ещё раз, но позже окна двойного нажатия
+        await asyncio.sleep(0.3)
+        fresh = payload(artist, datetime.now().isoformat())
+        await main.web_app_data_handler(tg_stubs.message_update(bot, artist, web_app_data=fresh), tg_stubs.context(bot))
+        assert len(main.db[str(artist)]) == 2, "resubmission after the double-tap window was dropped"
+        main.SUBMISSIONS.close()
+
+
+def main_cli():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--artists", type=int, default=100)
+    ap.add_argument("--retries", type=float, default=0.5, help="share of clients resending the same payload")
+    ap.add_argument("--double-taps", type=float, default=0.3, help="share of clients tapping Submit twice")
+    ap.add_argument("--gap-ms", type=float, default=40, help="pause between a payload and its repeat")
+    ap.add_argument("--latency-ms", type=float, default=80, help="Bot API round trip")
+    ap.add_argument("--seed", type=int, default=1234)
+    args = ap.parse_args()
+
+    path = os.path.join(workdir, "submissions-bench.sqlite3")
+    before = asyncio.run(run(args, NoDedup(), 930000000))
+    dedup = main.SubmissionDedup(path, main.SUBMISSION_DEDUP_TTL_HOURS * 3600, main.SUBMISSION_DOUBLE_TAP_MS / 1000, main.SUBMISSION_DEDUP_MAX_KEYS)
+    after = asyncio.run(run(args, dedup, 940000000))
+    dedup.close()
+
+    print(f"artists={args.artists} retries={args.retries:.0%} double taps={args.double_taps:.0%} latency={args.latency_ms:.0f} ms")
+    print(f"{'':<8}{'payloads':>10}{'releases':>10}{'mod msgs':>10}{'pins':>6}{'first p50':>11}{'repeat p50':>12}{'total s':>9}")
+    for name, r in (("before", before), ("after", after)):
+        print(
+            f"{name:<8}{r['payloads']:>10}{r['releases']:>10}{r['cards']:>10}{r['pins']:>6}"
+            f"{r['first_p50']:>11.1f}{r['repeat_p50']:>12.1f}{r['elapsed_s']:>9.2f}"
+        )
+    assert after["releases"] == args.artists, f"{after['releases']} releases for {args.artists} artists"
+
+    asyncio.run(check_restart(os.path.join(workdir, "submissions-restart.sqlite3"), 950000000))
+    print("restart: retry after reopening the file got the original result; resubmit after the window was accepted")
+
+
+if __name__ == "__main__":
+    main_cli()
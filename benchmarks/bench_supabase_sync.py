@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+"""Supabase mirror under a stream of moderation changes: node_bot.js-style full resync vs SupabaseSync.
+
+Запуск: python benchmarks/bench_supabase_sync.py [--releases 10000] [--seconds 10] [--rate 20] [--latency-ms 15]
+
+Зеркало — локальный fake_postgrest.py с задержкой --latency-ms на запрос. Оба варианта
+стартуют с заполненного зеркала, дальше --seconds секунд идёт --rate смен статуса в секунду
+(и изредка активация кабинета) через тот же путь, что save_db: _mark_release_changed +
+_log_mutations. «before» — логика node_bot.js: каждое изменение перезапускает таймер
+SUPABASE_SYNC_DEBOUNCE_MS, по таймеру все релизы, анкеты и кабинеты уходят заново.
+«after» — SUPABASE: из журнала берутся только изменённые пользователи, ожидание тишины
+ограничено двумя окнами. Задержка — от изменения до прихода строки с ним на сервер; заодно
+снимается гейдж bot_supabase_sync_lag_seconds. Затем: прогон «after» с ошибками сервера
+(503 и обрывы соединения) сходится к тому же состоянию, а новый экземпляр на том же журнале
+отправляет только то, что изменилось, пока воркер стоял.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import random
+import tempfile
+import time
+
+import datagen
+from _bootstrap import import_main
+from fake_postgrest import FakePostgREST
+
+workdir = tempfile.mkdtemp(prefix="cxner-bench-supabase-")
+main = import_main(workdir)
+
+KEY = "bench-service-key"
+TABLES = {"releases": "cxrner_releases", "forms": "cxrner_forms", "cabinet": "cxrner_cabinet_users"}
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else float("nan")
+
+
+def make_sync(server: FakePostgREST, args) -> "main.SupabaseSync":
+    return main.SupabaseSync(
+        server.url, KEY, "public", TABLES, chunk_size=args.chunk_size, debounce=args.debounce_ms / 1000,
+        chunk_delay=0.0, timeout=5.0, retries=main.SUPABASE_FETCH_RETRIES, retry_delay=0.05,
+    )
+
+
+class NodeStyleSync:
+    """scheduleSupabaseSync + syncSupabaseNow from node_bot.js on top of the same HTTP client."""
+
+    def __init__(self, sync):
+        self.sync = sync
+        self.timer: asyncio.TimerHandle | None = None
+        self.running: asyncio.Task | None = None
+        self.queued = False
+
+    def notify(self, store: str) -> None:
+        if self.timer is not None:
+            self.timer.cancel()
+        self.timer = asyncio.get_running_loop().call_later(max(0.3, self.sync.debounce), self._fire)
+
+    def _fire(self) -> None:
+        self.timer = None
+        if self.running is not None and not self.running.done():
+            self.queued = True
+            return
+        self.running = asyncio.ensure_future(self.sync_now())
+
+    async def sync_now(self) -> None:
+        while True:
+            users = {uid: releases for uid, releases in main.db.items()}
+            await self.sync.push(self.sync.plan(users, dict(main.cabinet_users)))
+            if not self.queued:
+                return
+            self.queued = False
+
+    def idle(self) -> bool:
+        return self.timer is None and (self.running is None or self.running.done())
+
+
+class LagProbe:
+    """Marks every change with a unique moderation_time and waits for it on the server."""
+
+    def __init__(self):
+        self.changed: dict[str, float] = {}
+        self.latest: dict[tuple, str] = {}
+        self.lags: list[float] = []
+        self.superseded = 0
+
+    def change(self, release_key: tuple, mark: str) -> None:
+        # прежняя отметка этого релиза до сервера уже не дойдёт — её перекрыла новая
+        old = self.latest.get(release_key)
+        if old is not None and self.changed.pop(old, None) is not None:
+            self.superseded += 1
+        self.latest[release_key] = mark
+        self.changed[mark] = time.time()
+
+    def on_upsert(self, table: str, rows: list, ts: float) -> None:
+        if table != TABLES["releases"]:
+            return
+        for row in rows:
+            mark = row["release_data"].get("moderation_time")
+            at = self.changed.pop(mark, None)
+            if at is not None:
+                self.lags.append(ts - at)
+
+
+async def moderation_stream(args, rnd: random.Random, probe: LagProbe, seconds: float) -> int:
+    uids = list(main.db)
+    actions = int(seconds * args.rate)
+    started = time.perf_counter()
+    for n in range(actions):
+        uid = rnd.choice(uids)
+        idx = rnd.randrange(len(main.db[uid]))
+        release = main.db[uid][idx]
+        mark = f"bench-{time.time_ns()}-{n}"
+        release["status"] = rnd.choice((main.STATUS_APPROVED, main.STATUS_REJECTED, main.STATUS_NEEDS_FIX))
+        release["moderation_time"] = mark
+        probe.change((uid, idx), mark)
+        main._mark_release_changed(uid, idx)
+        main._log_mutations("db", main.db)
+        if n % 25 == 0:
+            main.cabinet_users[str(800000000 + n)] = {"approved": True, "activated_at": "2025-02-01T12:00:00", "username": f"bench{n}", "first_name": "Bench"}
+            main._log_mutations("cabinet_users", main.cabinet_users)
+        await asyncio.sleep(max(0.0, started + (n + 1) / args.rate - time.perf_counter()))
+    return actions
+
+
+def mirror_matches(server: FakePostgREST) -> bool:
+    remote = {(row["user_id"], row["release_idx"]): row["release_data"] for row in server.rows(TABLES["releases"])}
+    local = {(uid, idx): rel for uid, releases in main.db.items() for idx, rel in enumerate(releases)}
+    cabinet = {row["user_id"] for row in server.rows(TABLES["cabinet"])}
+    return remote == local and cabinet == set(main.cabinet_users)
+
+
+def fresh_log(label: str) -> None:
+    # файлы догоняют память прошлого прогона: полная синхронизация читает их, как на старте бота
+    main._atomic_write_json(main.DB_FILE, main.db)
+    main._atomic_write_json(main.CABINET_USERS_FILE, main.cabinet_users)
+    main.MUTATIONS = main.MutationLog(os.path.join(workdir, f"mutations-{label}.sqlite3"))
+    main._warm_mutation_log()
+
+
+async def run(args, label: str, error_rates: dict | None = None) -> dict:
+    server = FakePostgREST(key=KEY, error_rates=error_rates, seed=args.seed).start()
+    fresh_log(label)
+    sync = make_sync(server, args)
+    probe = LagProbe()
+    node = label == "before"
+    with contextlib.redirect_stdout(io.StringIO()):
+        # зеркало до замера заполнено и совпадает с базой
+        rates, server.error_rates = server.error_rates, {}
+        await sync.full_sync()
+        server.error_rates = rates
+    server.latency_ms = args.latency_ms
+    server.calls.clear()
+    server.add_listener(probe.on_upsert)
+    driver = NodeStyleSync(sync) if node else sync
+    main.SUPABASE = driver
+    gauge = []
+    if not node:
+        sync.start()
+
+    async def sample():
+        # гейдж bot_supabase_sync_lag_seconds так, как его увидел бы /metrics
+        while True:
+            gauge.append(sync.lag())
+            await asyncio.sleep(0.05)
+
+    sampler = asyncio.ensure_future(sample())
+    actions = await moderation_stream(args, random.Random(args.seed), probe, args.seconds)
+    t0 = time.perf_counter()
+    while not (driver.idle() if node else sync.lag() == 0 and not sync._wake.is_set()):
+        await asyncio.sleep(0.02)
+    drain = time.perf_counter() - t0
+    sampler.cancel()
+    if not node:
+        # без новых изменений воркер спит: сверка не гонится с пачкой в полёте
+        await asyncio.sleep(0.1)
+    matches = mirror_matches(server)
+    await sync.stop()
+    stats = server.stats()
+    server.stop()
+    return {
+        "actions": actions,
+        "requests": stats["requests"],
+        "rows": stats["rows"],
+        "mb": stats["bytes"] / 1048576,
+        "lag_p50": percentile(probe.lags, 0.5) * 1000,
+        "lag_p99": percentile(probe.lags, 0.99) * 1000,
+        "lag_max": max(probe.lags, default=float("nan")) * 1000,
+        "gauge_max": None if node else max(gauge, default=0.0),
+        "drain_s": drain,
+        "superseded": probe.superseded,
+        "outcomes": stats["outcomes"],
+        "matches": matches,
+    }
+
+
+async def restart_check(args) -> tuple[int, int]:
+    """Changes made while the worker is down go out after a restart; nothing else is resent."""
+    server = FakePostgREST(key=KEY, seed=args.seed).start()
+    fresh_log("restart")
+    first = make_sync(server, args)
+    with contextlib.redirect_stdout(io.StringIO()):
+        await first.full_sync()
+    await first.stop()
+    main.SUPABASE = make_sync(server, args)  # не запущен: notify() ничего не будит
+    rnd = random.Random(args.seed + 1)
+    changed = set()
+    for _ in range(50):
+        uid = rnd.choice(list(main.db))
+        main.db[uid][0]["status"] = main.STATUS_APPROVED
+        main._mark_release_changed(uid, 0)
+        main._log_mutations("db", main.db)
+        changed.add(uid)
+    server.calls.clear()
+    second = make_sync(server, args)
+    sent = 0
+    while True:
+        n = await second.sync_once()
+        if not n:
+            break
+        sent += n
+    await second.stop()
+    assert mirror_matches(server), "mirror differs after the restart"
+    upserted = sum(c.rows for c in server.calls if c.method == "POST" and c.table == TABLES["releases"])
+    server.stop()
+    assert sent == len(changed), (sent, len(changed))
+    return len(changed), upserted
+
+
+def main_cli():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--releases", type=int, default=10_000)
+    ap.add_argument("--seconds", type=float, default=10.0, help="how long the moderation stream runs")
+    ap.add_argument("--rate", type=float, default=20.0, help="status changes per second")
+    ap.add_argument("--latency-ms", type=float, default=15.0, help="PostgREST round trip")
+    ap.add_argument("--chunk-size", type=int, default=main.SUPABASE_SYNC_CHUNK_SIZE)
+    ap.add_argument("--debounce-ms", type=int, default=main.SUPABASE_SYNC_DEBOUNCE_MS)
+    ap.add_argument("--seed", type=int, default=1234)
+    args = ap.parse_args()
+
+    data = datagen.generate(args.releases, args.seed)
+    datagen.write(workdir, data, main)
+    main.db.update(data["db"])
+    main.cabinet_users.update(data["cabinet_users"])
+
+    results = {}
+    for label, errors in (("before", None), ("after", None), ("after + faults", {"503": 0.05, "reset": 0.02})):
+        results[label] = asyncio.run(run(args, label, errors))
+
+    print(
+        f"releases={args.releases} stream={args.seconds:.0f} s x {args.rate:.0f}/s latency={args.latency_ms:.0f} ms "
+        f"chunk={args.chunk_size} debounce={args.debounce_ms} ms"
+    )
+    print(f"{'':<16}{'requests':>9}{'rows':>8}{'MB':>7}{'lag p50 ms':>12}{'p99 ms':>9}{'max ms':>9}{'lag gauge max s':>17}{'drain s':>9}")
+    for label, r in results.items():
+        print(
+            f"{label:<16}{r['requests']:>9}{r['rows']:>8}{r['mb']:>7.1f}{r['lag_p50']:>12.0f}{r['lag_p99']:>9.0f}"
+            f"{r['lag_max']:>9.0f}{'-' if r['gauge_max'] is None else format(r['gauge_max'], '.2f'):>17}{r['drain_s']:>9.2f}"
+        )
+        assert r["matches"], f"{label}: mirror differs from the database"
+    faults = results["after + faults"]["outcomes"]
+    print(f"faults: server answered {faults}; every run ended with the mirror equal to the database")
+
+    changed, upserted = asyncio.run(restart_check(args))
+    print(f"restart: {changed} users changed while stopped -> {upserted} release rows sent, no full resync")
+
+
+if __name__ == "__main__":
+    main_cli()
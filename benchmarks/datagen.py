@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""Deterministic synthetic stores for benchmarks: db, moderation_db, history, cabinet_users.
+
+Одинаковые (releases, seed) всегда дают байт-в-байт одинаковые данные, поэтому отчёты
+разных коммитов сравнимы. Распределения грубо повторяют прод: у большинства артистов
+1–3 релиза, у немногих — десятки; большая часть анкет уже обработана модерацией.
+"""
+import json
+import os
+import random
+from datetime import datetime, timedelta
+
+BASE_TIME = datetime(2025, 1, 1, 12, 0, 0)
+
+STATUS_WEIGHTS = (
+    ("on_upload", 10),
+    ("moderation", 5),
+    ("approved", 55),
+    ("rejected", 20),
+    ("needs_fix", 8),
+    ("deleted", 2),
+)
+GENRES = ("hip-hop", "pop", "rock", "phonk", "drill", "indie", "electronic", "r&b")
+REJECT_REASONS = ("Плохое качество обложки", "Нет прав на семпл", "Неверная дата", "Ошибки в метаданных")
+WORDS = ("night", "void", "tokyo", "rain", "lost", "neon", "drift", "ghost", "summer", "echo", "cold", "fire")
+
+
+def _title(rnd: random.Random) -> str:
+    return " ".join(rnd.choice(WORDS).capitalize() for _ in range(rnd.randint(1, 3)))
+
+
+def _user_sizes(rnd: random.Random, releases: int) -> list[int]:
+    sizes = []
+    left = releases
+    while left > 0:
+        # длинный хвост: ~3% активных артистов с 10–60 релизами
+        n = rnd.randint(10, 60) if rnd.random() < 0.03 else rnd.choice((1, 1, 1, 2, 2, 3))
+        n = min(n, left)
+        sizes.append(n)
+        left -= n
+    return sizes
+
+
+def generate(releases: int, seed: int = 1234) -> dict:
+    """Returns {"db", "moderation_db", "history", "cabinet_users"} for the given number of releases."""
+    rnd = random.Random(seed)
+    statuses = [s for s, _ in STATUS_WEIGHTS]
+    weights = [w for _, w in STATUS_WEIGHTS]
+    db: dict = {}
+    messages: list = []
+    history: dict = {}
+    cabinet: dict = {}
+    message_id = 1000
+    for u, size in enumerate(_user_sizes(rnd, releases)):
+        uid = str(100000000 + u * 7919)
+        nick = f"{rnd.choice(WORDS)}_{u}"
+        rels = []
+        for idx in range(size):
+            submitted = BASE_TIME - timedelta(minutes=rnd.randrange(0, 365 * 24 * 60))
+            status = rnd.choices(statuses, weights)[0]
+            album = rnd.random() < 0.15
+            rel = {
+                "type": "альбом" if album else "сингл",
+                "name": _title(rnd),
+                "subname": "." if rnd.random() < 0.7 else _title(rnd),
+                "has_lyrics": "Да" if rnd.random() < 0.8 else "Нет, это инструментал",
+                "nick": nick,
+                "fio": "Иванов Иван Иванович",
+                "date": (submitted + timedelta(days=rnd.randint(3, 30))).strftime("%d.%m.%Y"),
+                "version": "Оригинал",
+                "genre": rnd.choice(GENRES),
+                "link": f"https://drive.google.com/drive/folders/{rnd.getrandbits(64):016x}",
+                "yandex": ".",
+                "mat": rnd.choice(("Да", "Нет")),
+                "promo": "." if rnd.random() < 0.5 else " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(5, 60))),
+                "comment": ".",
+                "tracklist": "\n".join(f"{n + 1}. {_title(rnd)}" for n in range(rnd.randint(4, 12))) if album else ".",
+                "tg": f"@{nick}",
+                "status": status,
+                "submission_time": submitted.isoformat(),
+                "moderation_message_id": message_id,
+                "reminder_sent": rnd.random() < 0.5,
+                "source": "mini_app" if rnd.random() < 0.4 else "bot",
+            }
+            if status != "on_upload":
+                moderated = submitted + timedelta(hours=rnd.randint(1, 96))
+                rel["moderator"] = rnd.choice(("mod_anna", "mod_kirill", "mod_sasha"))
+                rel["moderation_time"] = moderated.isoformat()
+                history[f"{uid}_{idx}"] = [{
+                    "timestamp": moderated.isoformat(),
+                    "old_status": "on_upload",
+                    "new_status": status,
+                    "moderator_id": 881379104,
+                    "moderator_name": rel["moderator"],
+                    "reason": None,
+                }]
+            if status == "rejected":
+                rel["reject_reason"] = rnd.choice(REJECT_REASONS)
+            if status == "approved" and rnd.random() < 0.6:
+                rel["upc"] = f"{rnd.randrange(10 ** 12):012d}"
+            if rnd.random() < 0.02:
+                rel["user_deleted"] = True
+            rels.append(rel)
+            messages.append({
+                "message_id": message_id,
+                "user_id": uid,
+                "username": nick,
+                "release_name": rel["name"],
+                "status": status,
+                "submission_time": rel["submission_time"],
+            })
+            message_id += 1
+        db[uid] = rels
+        if rnd.random() < 0.6:
+            cabinet[uid] = {"approved": True, "activated_at": BASE_TIME.isoformat(), "username": nick, "first_name": nick}
+    return {
+        "db": db,
+        "moderation_db": {"moderation_messages": messages},
+        "history": history,
+        "cabinet_users": cabinet,
+    }
+
+
+def heaviest_user(db: dict) -> str:
+    """User id with the most releases (worst case for /my and /search)."""
+    return max(db, key=lambda uid: len(db[uid]))
+
+
+def write(workdir: str, data: dict, main) -> None:
+    """Writes the generated stores under the file names main.py reads."""
+    files = {
+        main.DB_FILE: data["db"],
+        main.MODERATION_DB_FILE: data["moderation_db"],
+        main.HISTORY_FILE: data["history"],
+        main.CABINET_USERS_FILE: data["cabinet_users"],
+    }
+    for path, obj in files.items():
+        with open(os.path.join(workdir, path), "w", encoding="utf-8") as f:
+            json.dump(obj, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+"""Local stand-in for a PostgREST (Supabase REST) endpoint: upsert, delete, select, latency and error injection.
+
+Запуск отдельно:
+    python benchmarks/fake_postgrest.py --port 54321 --key service-key --latency-ms 20 --error-rate 503=0.05
+
+Бот направляется сюда ключами SUPABASE_URL=http://127.0.0.1:54321 и SUPABASE_SERVICE_ROLE_KEY=service-key.
+Таблицы живут в памяти и создаются первым upsert-ом; ключ строки — колонки из on_conflict.
+Фильтры: col=eq.v, col=gte.n, col=in.(a,"b"). Журнал запросов — GET /_fake/calls,
+содержимое таблицы — GET /_fake/tables/<name>.
+
+Ошибки:
+    503       — Service Unavailable (повторяемая);
+    429       — Too Many Requests с Retry-After;
+    reset     — закрываем соединение без ответа (httpx.RemoteProtocolError).
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+ERROR_KINDS = ("503", "429", "reset")
+
+
+class _Server(ThreadingHTTPServer):
+    request_queue_size = 256
+    daemon_threads = True
+
+
+class Call:
+    __slots__ = ("ts", "method", "table", "params", "rows", "bytes", "outcome", "duration")
+
+    def __init__(self, ts, method, table, params, rows, size, outcome, duration):
+        self.ts = ts
+        self.method = method
+        self.table = table
+        self.params = params
+        self.rows = rows
+        self.bytes = size
+        self.outcome = outcome
+        self.duration = duration
+
+    def as_dict(self) -> dict:
+        return {
+            "ts": self.ts, "method": self.method, "table": self.table, "params": self.params,
+            "rows": self.rows, "bytes": self.bytes, "outcome": self.outcome, "duration": self.duration,
+        }
+
+
+def _split_list(raw: str) -> list[str]:
+    """Values of in.(...): comma separated, optionally double-quoted with backslash escapes."""
+    values, current, quoted, escaped, was_quoted = [], [], False, False, False
+    for ch in raw:
+        if escaped:
+            current.append(ch)
+            escaped = False
+        elif quoted and ch == "\\":
+            escaped = True
+        elif ch == '"':
+            quoted = not quoted
+            was_quoted = True
+        elif ch == "," and not quoted:
+            values.append("".join(current))
+            current, was_quoted = [], False
+        else:
+            current.append(ch)
+    if current or was_quoted:
+        values.append("".join(current))
+    return values
+
+
+def row_matches(row: dict, filters: list[tuple[str, str]]) -> bool:
+    for column, expr in filters:
+        op, _, value = expr.partition(".")
+        cell = row.get(column)
+        if op == "eq" and str(cell) != value:
+            return False
+        if op == "gte" and not (cell is not None and float(cell) >= float(value)):
+            return False
+        if op == "in" and str(cell) not in _split_list(value.strip()[1:-1]):
+            return False
+        if op not in ("eq", "gte", "in"):
+            raise ValueError(f"unsupported filter {column}={expr}")
+    return True
+
+
+class FakePostgREST:
+    """Thread-backed fake PostgREST server holding tables in memory."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        key: str = "service-key",
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rates: dict | None = None,
+        retry_after: int = 1,
+        seed: int = 0,
+    ):
+        self.key = key
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        # {"503": 0.05, "reset": 0.01}
+        self.error_rates = dict(error_rates or {})
+        self.retry_after = retry_after
+        self.tables: dict[str, dict[tuple, dict]] = {}
+        self.calls: list[Call] = []
+        self._rnd = random.Random(seed)
+        self._lock = threading.Lock()
+        self._listeners: list = []
+        self._server = _Server((host, port), self._make_handler())
+        self._thread: threading.Thread | None = None
+
+    # --- жизненный цикл ---
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakePostgREST":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-postgrest", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def add_listener(self, fn) -> None:
+        """fn(table, rows, ts) is invoked from the server thread after every applied upsert."""
+        self._listeners.append(fn)
+
+    # --- данные ---
+    def rows(self, table: str) -> list[dict]:
+        with self._lock:
+            return [dict(row) for row in self.tables.get(table, {}).values()]
+
+    def upsert(self, table: str, conflict: list[str], rows: list[dict]) -> None:
+        with self._lock:
+            target = self.tables.setdefault(table, {})
+            for row in rows:
+                key = tuple(str(row.get(column)) for column in conflict)
+                target[key] = dict(target.get(key, {}), **row)
+
+    def delete(self, table: str, filters: list[tuple[str, str]]) -> int:
+        if not filters:
+            raise ValueError("DELETE without filters")
+        with self._lock:
+            target = self.tables.get(table, {})
+            doomed = [key for key, row in target.items() if row_matches(row, filters)]
+            for key in doomed:
+                del target[key]
+        return len(doomed)
+
+    def select(self, table: str, filters: list[tuple[str, str]]) -> list[dict]:
+        return [row for row in self.rows(table) if row_matches(row, filters)]
+
+    def record(self, method, table, params, rows, size, outcome, duration) -> None:
+        with self._lock:
+            self.calls.append(Call(time.time(), method, table, params, rows, size, outcome, duration))
+
+    def stats(self) -> dict:
+        out = {"requests": 0, "rows": 0, "bytes": 0, "outcomes": {}}
+        for call in list(self.calls):
+            out["requests"] += 1
+            out["bytes"] += call.bytes
+            out["outcomes"][call.outcome] = out["outcomes"].get(call.outcome, 0) + 1
+            if call.outcome == "ok":
+                out["rows"] += call.rows
+        return out
+
+    def _pick_error(self) -> str | None:
+        for kind, rate in self.error_rates.items():
+            if rate and self._rnd.random() < rate:
+                return kind
+        return None
+
+    def _delay(self) -> None:
+        base = self.latency_ms + (self._rnd.uniform(0, self.jitter_ms) if self.jitter_ms else 0.0)
+        if base > 0:
+            time.sleep(base / 1000)
+
+    def _make_handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, payload=None, headers: dict | None = None) -> None:
+                body = b"" if payload is None else json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                if body:
+                    self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _route(self) -> tuple[str | None, list[tuple[str, str]]]:
+                parsed = urlparse(self.path)
+                parts = parsed.path.strip("/").split("/")
+                table = parts[2] if len(parts) == 3 and parts[:2] == ["rest", "v1"] else None
+                return table, parse_qsl(parsed.query, keep_blank_values=True)
+
+            def _authorized(self) -> bool:
+                return self.headers.get("apikey") == api.key and self.headers.get("Authorization") == f"Bearer {api.key}"
+
+            def _handle(self, method: str) -> None:
+                started = time.perf_counter()
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                if urlparse(self.path).path.startswith("/_fake/"):
+                    self._control(urlparse(self.path).path[len("/_fake/"):])
+                    return
+                table, query = self._route()
+                params = dict(query)
+                if table is None:
+                    self._send(404, {"code": "PGRST125", "message": f"Invalid path {self.path}"})
+                    return
+                if not self._authorized():
+                    api.record(method, table, params, 0, len(body), "401", time.perf_counter() - started)
+                    self._send(401, {"code": "PGRST301", "message": "Invalid API key"})
+                    return
+                error = api._pick_error()
+                api._delay()
+                if error == "reset":
+                    api.record(method, table, params, 0, len(body), "reset", time.perf_counter() - started)
+                    self.close_connection = True
+                    return
+                if error in ("503", "429"):
+                    api.record(method, table, params, 0, len(body), error, time.perf_counter() - started)
+                    headers = {"Retry-After": str(api.retry_after)} if error == "429" else None
+                    self._send(int(error), {"message": "injected error"}, headers)
+                    return
+                filters = [(k, v) for k, v in query if k not in ("on_conflict", "select", "order", "limit", "columns")]
+                try:
+                    if method == "POST":
+                        rows = json.loads(body or b"[]")
+                        rows = rows if isinstance(rows, list) else [rows]
+                        if len({tuple(sorted(row)) for row in rows}) > 1:
+                            raise ValueError("All object keys must match")
+                        conflict = [c for c in params.get("on_conflict", "").split(",") if c]
+                        if not conflict or "merge-duplicates" not in self.headers.get("Prefer", ""):
+                            raise ValueError("fake server supports upserts only (on_conflict + Prefer: resolution=merge-duplicates)")
+                        api.upsert(table, conflict, rows)
+                        api.record(method, table, params, len(rows), len(body), "ok", time.perf_counter() - started)
+                        now = time.time()
+                        for fn in api._listeners:
+                            fn(table, rows, now)
+                        self._send(201)
+                    elif method == "DELETE":
+                        removed = api.delete(table, filters)
+                        api.record(method, table, params, removed, len(body), "ok", time.perf_counter() - started)
+                        self._send(204)
+                    else:
+                        rows = api.select(table, filters)
+                        api.record(method, table, params, len(rows), len(body), "ok", time.perf_counter() - started)
+                        self._send(200, rows)
+                except ValueError as e:
+                    api.record(method, table, params, 0, len(body), "400", time.perf_counter() - started)
+                    self._send(400, {"code": "PGRST102", "message": str(e)})
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_POST(self):
+                self._handle("POST")
+
+            def do_DELETE(self):
+                self._handle("DELETE")
+
+            def _control(self, action: str) -> None:
+                if action == "calls":
+                    self._send(200, [c.as_dict() for c in list(api.calls)])
+                elif action == "stats":
+                    self._send(200, api.stats())
+                elif action.startswith("tables/"):
+                    self._send(200, api.rows(action[len("tables/"):]))
+                else:
+                    self._send(404, {"message": "unknown control"})
+
+        return Handler
+
+
+def parse_error_rates(specs: list[str]) -> dict:
+    """["503=0.05", "reset=0.01"] -> {"503": 0.05, "reset": 0.01}"""
+    rates = {}
+    for spec in specs:
+        kind, _, value = spec.partition("=")
+        if kind not in ERROR_KINDS:
+            raise ValueError(f"unknown error kind {kind!r}, expected one of {ERROR_KINDS}")
+        rates[kind] = float(value)
+    return rates
+
+
+def main_cli():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=54321)
+    ap.add_argument("--key", default="service-key", help="expected apikey / Bearer token")
+    ap.add_argument("--latency-ms", type=float, default=20.0)
+    ap.add_argument("--jitter-ms", type=float, default=10.0)
+    ap.add_argument("--error-rate", action="append", default=[], metavar="KIND=RATE",
+                    help="inject errors, KIND is 503, 429 or reset (repeatable)")
+    ap.add_argument("--retry-after", type=int, default=1)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    server = FakePostgREST(
+        host=args.host, port=args.port, key=args.key, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        error_rates=parse_error_rates(args.error_rate), retry_after=args.retry_after, seed=args.seed,
+    ).start()
+    print(f"fake PostgREST on {server.url} (key {args.key!r})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main_cli()
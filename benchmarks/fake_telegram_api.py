@@ -0,0 +1,427 @@
+# -*- coding: utf-8 -*-
+"""Local stand-in for the Telegram Bot API: latency, error injection and call recording.
+
+Запуск отдельно:
+    python benchmarks/fake_telegram_api.py --port 8081 --latency-ms 40 --jitter-ms 20 --error-rate 429=0.02
+
+Бот направляется сюда переменной TELEGRAM_API_BASE_URL=http://127.0.0.1:8081.
+Поддержаны методы, которые вызывает main.py (плюс deleteWebhook из bootstrap polling в PTB).
+Апдейты в бота подаются через inject_update()/inject_message()/inject_callback(), а из-под
+другого процесса — POST /_fake/updates; журнал вызовов — GET /_fake/calls.
+
+Ошибки:
+    timeout   — держим соединение дольше read timeout клиента (TimedOut в PTB), см. --timeout-sleep;
+    429       — ответ Too Many Requests с retry_after (RetryAfter в PTB);
+    protocol  — закрываем соединение без ответа (httpx.RemoteProtocolError).
+"""
+import argparse
+import email.parser
+import email.policy
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+SUPPORTED_METHODS = (
+    "getUpdates", "sendMessage", "editMessageText", "editMessageReplyMarkup", "pinChatMessage",
+    "sendDocument", "sendPhoto", "getChat", "getChatMember", "getMe", "answerCallbackQuery",
+    "getWebhookInfo", "deleteWebhook",
+)
+ERROR_KINDS = ("timeout", "429", "protocol")
+# Поля, которые PTB сериализует как JSON внутри form-data; остальные — строки как есть.
+_JSON_FIELDS = {
+    "chat_id", "message_id", "offset", "limit", "timeout", "allowed_updates", "reply_markup",
+    "reply_to_message_id", "reply_parameters", "show_alert", "disable_web_page_preview",
+    "link_preview_options", "user_id", "entities", "caption_entities", "disable_notification",
+}
+
+
+class _Server(ThreadingHTTPServer):
+    # backlog по умолчанию — 5: пачка из сотен новых соединений получала бы RST ещё до accept()
+    request_queue_size = 1024
+    daemon_threads = True
+
+
+class Call:
+    __slots__ = ("ts", "method", "params", "outcome", "duration", "result")
+
+    def __init__(self, ts, method, params, outcome, duration, result=None):
+        self.ts = ts
+        self.method = method
+        self.params = params
+        self.outcome = outcome
+        self.duration = duration
+        self.result = result
+
+    def as_dict(self) -> dict:
+        return {"ts": self.ts, "method": self.method, "params": self.params, "outcome": self.outcome, "duration": self.duration}
+
+
+class FakeTelegramAPI:
+    """Thread-backed fake Bot API server holding chats, messages and an update queue in memory."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        method_latency_ms: dict | None = None,
+        error_rates: dict | None = None,
+        timeout_sleep: float = 125.0,
+        retry_after: int = 1,
+        seed: int = 0,
+        bot_id: int = 7000000001,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.method_latency_ms = dict(method_latency_ms or {})
+        # {"*": {"429": 0.01}, "sendMessage": {"protocol": 0.05}}
+        self.error_rates = {k: dict(v) for k, v in (error_rates or {}).items()}
+        self.timeout_sleep = timeout_sleep
+        self.retry_after = retry_after
+        self.bot = {"id": bot_id, "is_bot": True, "first_name": "Fake Bot", "username": "fake_load_bot"}
+        self.calls: list[Call] = []
+        self.messages: dict[tuple[int, int], dict] = {}
+        self._rnd = random.Random(seed)
+        self._cond = threading.Condition()
+        self._updates: list[dict] = []
+        self._update_ids = itertools.count(1)
+        self._message_ids: dict[int, itertools.count] = {}
+        self._callback_ids = itertools.count(1)
+        self._listeners: list = []
+        self.polling = threading.Event()
+        self._server = _Server((host, port), self._make_handler())
+        self._thread: threading.Thread | None = None
+
+    # --- жизненный цикл ---
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeTelegramAPI":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-telegram-api", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        with self._cond:
+            self._cond.notify_all()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def add_listener(self, fn) -> None:
+        """fn(call) is invoked from the server thread after every recorded call."""
+        self._listeners.append(fn)
+
+    # --- апдейты в сторону бота ---
+    def inject_update(self, update: dict) -> int:
+        with self._cond:
+            update = dict(update, update_id=next(self._update_ids))
+            self._updates.append(update)
+            self._cond.notify_all()
+        return update["update_id"]
+
+    @staticmethod
+    def user(user_id: int, username: str | None = None) -> dict:
+        return {"id": user_id, "is_bot": False, "first_name": f"User{user_id}", "username": username or f"user{user_id}"}
+
+    def _chat(self, chat_id: int) -> dict:
+        return {"id": chat_id, "type": "supergroup" if chat_id < 0 else "private", "title": "Moderation" if chat_id < 0 else None}
+
+    def inject_message(self, user_id: int, chat_id: int | None = None, text: str | None = None, web_app_data: str | None = None) -> int:
+        chat_id = user_id if chat_id is None else chat_id
+        message = {
+            "message_id": self._next_message_id(chat_id),
+            "date": int(time.time()),
+            "chat": self._chat(chat_id),
+            "from": self.user(user_id),
+        }
+        if text is not None:
+            message["text"] = text
+            if text.startswith("/"):
+                message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        if web_app_data is not None:
+            message["web_app_data"] = {"data": web_app_data, "button_text": "Open"}
+        return self.inject_update({"message": message})
+
+    def inject_callback(self, user_id: int, message: dict, data: str) -> str:
+        callback_id = str(next(self._callback_ids))
+        self.inject_update({
+            "callback_query": {
+                "id": callback_id,
+                "from": self.user(user_id),
+                "chat_instance": "fake",
+                "data": data,
+                "message": message,
+            }
+        })
+        return callback_id
+
+    # --- обработка вызовов ---
+    def _next_message_id(self, chat_id: int) -> int:
+        counter = self._message_ids.get(chat_id)
+        if counter is None:
+            counter = self._message_ids.setdefault(chat_id, itertools.count(1))
+        return next(counter)
+
+    def _pick_error(self, method: str) -> str | None:
+        if method == "getUpdates":
+            return None
+        for scope in (method, "*"):
+            for kind, rate in self.error_rates.get(scope, {}).items():
+                if rate and self._rnd.random() < rate:
+                    return kind
+        return None
+
+    def _delay(self, method: str) -> None:
+        base = self.method_latency_ms.get(method, self.latency_ms)
+        if self.jitter_ms:
+            base += self._rnd.uniform(0, self.jitter_ms)
+        if base > 0:
+            time.sleep(base / 1000)
+
+    def _store_message(self, chat_id: int, extra: dict) -> dict:
+        message = {
+            "message_id": self._next_message_id(chat_id),
+            "date": int(time.time()),
+            "chat": self._chat(chat_id),
+            "from": self.bot,
+        }
+        message.update({k: v for k, v in extra.items() if v is not None})
+        with self._cond:
+            self.messages[(chat_id, message["message_id"])] = message
+        return message
+
+    def _edit_message(self, params: dict, **changes) -> dict | bool:
+        chat_id, message_id = params.get("chat_id"), params.get("message_id")
+        if chat_id is None:
+            return True  # inline_message_id
+        with self._cond:
+            message = self.messages.get((chat_id, message_id))
+            if message is None:
+                message = {"message_id": message_id, "date": int(time.time()), "chat": self._chat(chat_id), "from": self.bot}
+                self.messages[(chat_id, message_id)] = message
+            for key, value in changes.items():
+                if value is None:
+                    message.pop(key, None)
+                else:
+                    message[key] = value
+            message["edit_date"] = int(time.time())
+            return dict(message)
+
+    def _get_updates(self, params: dict) -> list[dict]:
+        offset = int(params.get("offset") or 0)
+        limit = int(params.get("limit") or 100)
+        deadline = time.monotonic() + float(params.get("timeout") or 0)
+        self.polling.set()
+        with self._cond:
+            while True:
+                self._updates = [u for u in self._updates if u["update_id"] >= offset]
+                if self._updates or time.monotonic() >= deadline:
+                    return self._updates[:limit]
+                self._cond.wait(deadline - time.monotonic())
+
+    def dispatch(self, method: str, params: dict):
+        if method == "getUpdates":
+            return self._get_updates(params)
+        if method == "getMe":
+            return self.bot
+        if method == "getWebhookInfo":
+            return {"url": "", "has_custom_certificate": False, "pending_update_count": 0}
+        if method in ("deleteWebhook", "pinChatMessage", "answerCallbackQuery"):
+            return True
+        if method == "getChat":
+            # getChat отдаёт ChatFullInfo: у PTB в нём обязательны accent_color_id и max_reaction_count
+            return dict(self._chat(int(params.get("chat_id", 0))), accent_color_id=0, max_reaction_count=11)
+        if method == "getChatMember":
+            return {"status": "administrator", "user": self.bot, "can_be_edited": False}
+        if method == "sendMessage":
+            return self._store_message(params["chat_id"], {"text": params.get("text", ""), "reply_markup": params.get("reply_markup")})
+        if method == "editMessageText":
+            return self._edit_message(params, text=params.get("text", ""), reply_markup=params.get("reply_markup"))
+        if method == "editMessageReplyMarkup":
+            return self._edit_message(params, reply_markup=params.get("reply_markup"))
+        if method == "sendDocument":
+            return self._store_message(params["chat_id"], {
+                "document": {"file_id": "fake-doc", "file_unique_id": "fake-doc", "file_name": params.get("_filename", "file")},
+                "caption": params.get("caption"),
+            })
+        if method == "sendPhoto":
+            return self._store_message(params["chat_id"], {
+                "photo": [{"file_id": "fake-photo", "file_unique_id": "fake-photo", "width": 1, "height": 1}],
+                "caption": params.get("caption"),
+            })
+        raise KeyError(method)
+
+    def record(self, method: str, params: dict, outcome: str, duration: float, result=None) -> None:
+        call = Call(time.time(), method, params, outcome, duration, result)
+        with self._cond:
+            self.calls.append(call)
+        for fn in self._listeners:
+            fn(call)
+
+    def stats(self) -> dict:
+        out: dict[str, dict] = {}
+        for call in list(self.calls):
+            entry = out.setdefault(call.method, {"count": 0, "outcomes": {}})
+            entry["count"] += 1
+            entry["outcomes"][call.outcome] = entry["outcomes"].get(call.outcome, 0) + 1
+        return out
+
+    def _make_handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _read_params(self) -> dict:
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                ctype = self.headers.get("Content-Type", "")
+                params: dict = {}
+                if ctype.startswith("application/json") and body:
+                    params = json.loads(body)
+                elif ctype.startswith("multipart/form-data"):
+                    msg = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+                        f"Content-Type: {ctype}\r\n\r\n".encode() + body
+                    )
+                    for part in msg.iter_parts():
+                        name = part.get_param("name", header="content-disposition")
+                        if part.get_filename():
+                            params["_filename"] = part.get_filename()
+                        elif name:
+                            params[name] = part.get_content()
+                else:
+                    params = dict(parse_qsl(body.decode("utf-8"), keep_blank_values=True))
+                for key in _JSON_FIELDS & params.keys():
+                    if isinstance(params[key], str):
+                        try:
+                            params[key] = json.loads(params[key])
+                        except ValueError:
+                            pass
+                return params
+
+            def _send(self, status: int, payload: dict) -> None:
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self.do_POST()
+
+            def do_POST(self):
+                path = urlparse(self.path).path
+                if path.startswith("/_fake/"):
+                    self._control(path[len("/_fake/"):])
+                    return
+                parts = path.strip("/").split("/")
+                method = parts[-1] if len(parts) >= 2 and parts[-2].startswith("bot") else ""
+                started = time.perf_counter()
+                params = self._read_params()
+                error = api._pick_error(method)
+                api._delay(method)
+                if error == "timeout":
+                    time.sleep(api.timeout_sleep)
+                    api.record(method, params, "timeout", time.perf_counter() - started)
+                    self.close_connection = True
+                    return
+                if error == "protocol":
+                    api.record(method, params, "protocol", time.perf_counter() - started)
+                    self.close_connection = True
+                    return
+                if error == "429":
+                    api.record(method, params, "429", time.perf_counter() - started)
+                    self._send(429, {
+                        "ok": False,
+                        "error_code": 429,
+                        "description": f"Too Many Requests: retry after {api.retry_after}",
+                        "parameters": {"retry_after": api.retry_after},
+                    })
+                    return
+                try:
+                    result = api.dispatch(method, params)
+                except KeyError:
+                    api.record(method, params, "404", time.perf_counter() - started)
+                    self._send(404, {"ok": False, "error_code": 404, "description": "Not Found"})
+                    return
+                api.record(method, params, "ok", time.perf_counter() - started, result)
+                self._send(200, {"ok": True, "result": result})
+
+            def _control(self, action: str) -> None:
+                if action == "updates":
+                    update = self._read_params()
+                    self._send(200, {"ok": True, "update_id": api.inject_update(update)})
+                elif action == "calls":
+                    self._send(200, {"ok": True, "calls": [c.as_dict() for c in list(api.calls)]})
+                elif action == "stats":
+                    self._send(200, {"ok": True, "stats": api.stats()})
+                else:
+                    self._send(404, {"ok": False})
+
+        return Handler
+
+
+def parse_error_rates(specs: list[str]) -> dict:
+    """["429=0.02", "sendMessage:protocol=0.05"] -> {"*": {"429": 0.02}, "sendMessage": {"protocol": 0.05}}"""
+    rates: dict[str, dict] = {}
+    for spec in specs:
+        key, _, value = spec.partition("=")
+        method, _, kind = key.rpartition(":")
+        if kind not in ERROR_KINDS:
+            raise ValueError(f"unknown error kind {kind!r}, expected one of {ERROR_KINDS}")
+        rates.setdefault(method or "*", {})[kind] = float(value)
+    return rates
+
+
+def add_server_args(ap: argparse.ArgumentParser) -> None:
+    ap.add_argument("--latency-ms", type=float, default=30.0)
+    ap.add_argument("--jitter-ms", type=float, default=20.0)
+    ap.add_argument("--error-rate", action="append", default=[], metavar="[METHOD:]KIND=RATE",
+                    help="inject errors, KIND is timeout, 429 or protocol (repeatable)")
+    ap.add_argument("--timeout-sleep", type=float, default=125.0, help="how long a 'timeout' error holds the connection")
+    ap.add_argument("--retry-after", type=int, default=1)
+    ap.add_argument("--seed", type=int, default=0)
+
+
+def server_from_args(args, host: str = "127.0.0.1", port: int = 0) -> FakeTelegramAPI:
+    return FakeTelegramAPI(
+        host=host,
+        port=port,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rates=parse_error_rates(args.error_rate),
+        timeout_sleep=args.timeout_sleep,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+
+
+def main_cli():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8081)
+    add_server_args(ap)
+    args = ap.parse_args()
+    api = server_from_args(args, args.host, args.port).start()
+    print(f"fake Bot API on {api.url} (TELEGRAM_API_BASE_URL={api.url})", flush=True)
+    try:
+        while True:
+            time.sleep(5)
+            print(json.dumps(api.stats(), ensure_ascii=False), flush=True)
+    except KeyboardInterrupt:
+        api.stop()
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,286 @@
+# -*- coding: utf-8 -*-
+"""End-to-end load scenario: the real bot process against the fake Bot API.
+
+Запуск:
+    python benchmarks/load_scenario.py --artists 200 --moderators 5 --latency-ms 40 --jitter-ms 30
+    python benchmarks/load_scenario.py --artists 100 --error-rate 429=0.02 --error-rate sendMessage:protocol=0.02 --output load.json
+
+Бот запускается отдельным процессом (python main.py) во временной директории с
+TELEGRAM_API_BASE_URL, указывающим на fake_telegram_api.py. N артистов отправляют анкеты
+Mini App (web_app_data) с интенсивностью --rate в секунду, M модераторов разбирают появившиеся
+в чате модерации карточки и жмут «Принято». Замеряется:
+    submit_to_ack   — от апдейта с анкетой до ответа артисту;
+    submit_to_card  — от апдейта с анкетой до карточки в чате модерации;
+    click_to_answer — от нажатия кнопки до answerCallbackQuery;
+    click_to_edit   — от нажатия кнопки до правки карточки.
+"""
+import argparse
+import json
+import os
+import random
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+import datagen
+from _bootstrap import REPO_ROOT, import_main
+from fake_telegram_api import FakeTelegramAPI, add_server_args, server_from_args
+
+INVOCATION_DIR = os.getcwd()
+workdir = tempfile.mkdtemp(prefix="cxner-bench-load-")
+main = import_main(workdir)
+
+MODERATION_CHAT_ID = -1009000000001
+MODERATOR_BASE_ID = 500000000
+ARTIST_BASE_ID = 900000000
+
+
+def percentiles(samples: list[float]) -> dict:
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def q(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))], 2)
+
+    return {
+        "count": len(ordered),
+        "p50_ms": q(0.50),
+        "p90_ms": q(0.90),
+        "p95_ms": q(0.95),
+        "p99_ms": q(0.99),
+        "max_ms": round(ordered[-1], 2),
+        "mean_ms": round(statistics.fmean(ordered), 2),
+    }
+
+
+def release_payload(rnd: random.Random, artist: int) -> str:
+    # Латинские варианты значений валидатор принимает наравне с русскими.
+    return json.dumps({
+        "action": "webapp_release_submit",
+        "submitted_at": datetime.now().isoformat(timespec="milliseconds"),
+        "form": {
+            "type": "single",
+            "name": f"{rnd.choice(datagen.WORDS).capitalize()} {artist}",
+            "subname": ".",
+            "has_lyrics": "yes",
+            "nick": f"load_artist_{artist}",
+            "fio": "Иванов Иван Иванович",
+            "date": (datetime.now() + timedelta(days=14)).strftime("%d.%m.%Y"),
+            "version": "Оригинал",
+            "genre": rnd.choice(datagen.GENRES),
+            "link": f"https://drive.google.com/drive/folders/load{artist}",
+            "yandex": ".",
+            "mat": "no",
+            "promo": ".",
+            "comment": ".",
+            "tg": f"@load_artist_{artist}",
+        },
+    }, ensure_ascii=False)
+
+
+class Scenario:
+    """Tracks injected updates and matches them with the bot's Bot API calls."""
+
+    def __init__(self, api: FakeTelegramAPI, artists: int):
+        self.api = api
+        self.lock = threading.Condition()
+        self.artists = artists
+        self.submitted: dict[int, float] = {}
+        self.acked: dict[int, float] = {}
+        self.cards: list[tuple[float, dict]] = []
+        self.clicks: dict[str, tuple[float, tuple]] = {}
+        self.answered: dict[str, float] = {}
+        self.edited: dict[tuple, float] = {}
+        self.samples: dict[str, list[float]] = {"submit_to_ack": [], "submit_to_card": [], "click_to_answer": [], "click_to_edit": []}
+        api.add_listener(self.on_call)
+
+    def on_call(self, call) -> None:
+        if call.outcome != "ok":
+            return
+        now = time.perf_counter()
+        params = call.params
+        with self.lock:
+            if call.method == "sendMessage":
+                chat_id = params.get("chat_id")
+                if chat_id in self.submitted and chat_id not in self.acked:
+                    self.acked[chat_id] = now
+                    self.samples["submit_to_ack"].append((now - self.submitted[chat_id]) * 1000)
+                elif chat_id == MODERATION_CHAT_ID and "m_approve_" in json.dumps(params.get("reply_markup") or {}):
+                    self._on_card(now, params, call.result)
+            elif call.method == "answerCallbackQuery":
+                callback_id = str(params.get("callback_query_id"))
+                if callback_id in self.clicks and callback_id not in self.answered:
+                    self.answered[callback_id] = now
+                    self.samples["click_to_answer"].append((now - self.clicks[callback_id][0]) * 1000)
+            elif call.method in ("editMessageText", "editMessageReplyMarkup"):
+                key = (params.get("chat_id"), params.get("message_id"))
+                for callback_id, (clicked, target) in self.clicks.items():
+                    if target == key and callback_id not in self.edited:
+                        self.edited[callback_id] = now
+                        self.samples["click_to_edit"].append((now - clicked) * 1000)
+                        break
+            self.lock.notify_all()
+
+    def _on_card(self, now: float, params: dict, call_result: dict) -> None:
+        buttons = [b for row in params["reply_markup"]["inline_keyboard"] for b in row]
+        approve = next(b["callback_data"] for b in buttons if b.get("callback_data", "").startswith("m_approve_"))
+        artist_id = int(approve[len("m_approve_"):].rsplit("_", 1)[0])
+        submitted = self.submitted.get(artist_id)
+        if submitted is not None:
+            self.samples["submit_to_card"].append((now - submitted) * 1000)
+        self.cards.append((now, call_result))
+
+    def submit(self, artist: int, payload: str) -> None:
+        with self.lock:
+            self.submitted[artist] = time.perf_counter()
+        self.api.inject_message(artist, web_app_data=payload)
+
+    def take_card(self, timeout: float) -> dict | None:
+        deadline = time.monotonic() + timeout
+        with self.lock:
+            while not self.cards:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    return None
+                self.lock.wait(left)
+            return self.cards.pop(0)[1]
+
+    def click(self, moderator: int, card: dict, data: str) -> str:
+        with self.lock:
+            callback_id = self.api.inject_callback(moderator, card, data)
+            self.clicks[callback_id] = (time.perf_counter(), (MODERATION_CHAT_ID, card["message_id"]))
+        return callback_id
+
+    def wait_answered(self, callback_id: str, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        with self.lock:
+            while callback_id not in self.answered:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    return False
+                self.lock.wait(left)
+        return True
+
+
+def moderator_loop(scenario: Scenario, moderator: int, think_ms: float, stop: threading.Event, rnd: random.Random) -> None:
+    while not stop.is_set():
+        card = scenario.take_card(timeout=0.5)
+        if card is None:
+            continue
+        if think_ms:
+            time.sleep(rnd.uniform(0, think_ms) / 1000)
+        buttons = [b for row in card["reply_markup"]["inline_keyboard"] for b in row]
+        data = next(b["callback_data"] for b in buttons if b["callback_data"].startswith("m_approve_"))
+        scenario.wait_answered(scenario.click(moderator, card, data), timeout=10)
+
+
+def start_bot(api_url: str, log_path: str) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        BOT_TOKEN="123456:FAKE-LOAD-TOKEN",
+        TELEGRAM_API_BASE_URL=api_url,
+        MODERATION_CHAT_ID=str(MODERATION_CHAT_ID),
+        ENABLE_WEB_SERVER="0",
+        PYTHONUNBUFFERED="1",
+    )
+    log = open(log_path, "w", encoding="utf-8")
+    return subprocess.Popen([sys.executable, os.path.join(REPO_ROOT, "main.py")], cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def wait_for_polling(api: FakeTelegramAPI, bot: subprocess.Popen, timeout: float) -> float:
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < timeout:
+        if bot.poll() is not None:
+            raise SystemExit(f"bot exited with code {bot.returncode}, see {os.path.join(workdir, 'bot.log')}")
+        if api.polling.wait(0.02):
+            return time.perf_counter() - t0
+    raise SystemExit("bot did not start polling in time")
+
+
+def main_cli():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--artists", type=int, default=100, help="N artists, one Mini App submission each")
+    ap.add_argument("--moderators", type=int, default=3, help="M moderators clicking approve")
+    ap.add_argument("--rate", type=float, default=50.0, help="submissions per second")
+    ap.add_argument("--think-ms", type=float, default=200.0, help="max moderator pause before a click")
+    ap.add_argument("--releases", type=int, default=0, help="pre-populate stores with this many synthetic releases")
+    ap.add_argument("--timeout", type=float, default=120.0, help="give up waiting for the scenario after this many seconds")
+    ap.add_argument("--output", help="write the JSON report here")
+    add_server_args(ap)
+    args = ap.parse_args()
+
+    if args.releases:
+        datagen.write(workdir, datagen.generate(args.releases, args.seed or 1234), main)
+    api = server_from_args(args).start()
+    scenario = Scenario(api, args.artists)
+    bot = start_bot(api.url, os.path.join(workdir, "bot.log"))
+    stop = threading.Event()
+    try:
+        ready = wait_for_polling(api, bot, timeout=60)
+        print(f"bot polling after {ready * 1000:.0f} ms (workdir {workdir})", flush=True)
+
+        moderators = [
+            threading.Thread(target=moderator_loop, args=(scenario, MODERATOR_BASE_ID + m, args.think_ms, stop, random.Random(args.seed + m)), daemon=True)
+            for m in range(args.moderators)
+        ]
+        for t in moderators:
+            t.start()
+
+        rnd = random.Random(args.seed)
+        t0 = time.perf_counter()
+        for n in range(args.artists):
+            scenario.submit(ARTIST_BASE_ID + n, release_payload(rnd, n))
+            delay = t0 + (n + 1) / args.rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+        deadline = time.monotonic() + args.timeout
+        with scenario.lock:
+            while len(scenario.edited) < args.artists and time.monotonic() < deadline:
+                scenario.lock.wait(0.5)
+        elapsed = time.perf_counter() - t0
+    finally:
+        stop.set()
+        bot.send_signal(signal.SIGINT)
+        try:
+            bot.wait(timeout=20)
+        except subprocess.TimeoutExpired:
+            bot.kill()
+        api.stop()
+
+    report = {
+        "meta": {
+            "artists": args.artists,
+            "moderators": args.moderators,
+            "rate": args.rate,
+            "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms,
+            "error_rate": args.error_rate,
+            "releases": args.releases,
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+        },
+        "elapsed_s": round(elapsed, 3),
+        "completed": len(scenario.edited),
+        "latency": {name: percentiles(samples) for name, samples in scenario.samples.items()},
+        "api_calls": api.stats(),
+    }
+    print(f"completed {report['completed']}/{args.artists} in {elapsed:.2f}s")
+    print(f"{'metric':<18}{'count':>7}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    for name, stats in report["latency"].items():
+        if stats["count"]:
+            print(f"{name:<18}{stats['count']:>7}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}{stats['max_ms']:>10.1f}")
+    for method, stats in sorted(report["api_calls"].items()):
+        print(f"  {method:<24}{stats['count']:>7}  {stats['outcomes']}")
+    if args.output:
+        with open(os.path.join(INVOCATION_DIR, args.output), "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main_cli()
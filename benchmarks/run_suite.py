@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""Hot-path benchmark suite on synthetic data with a JSON report and regression thresholds.
+
+Запуск:
+    python benchmarks/run_suite.py --scales 1000,10000 --output before.json
+    python benchmarks/run_suite.py --scales 1000,10000 --baseline before.json --output after.json
+
+Данные генерирует datagen.py (детерминированно по --seed), Telegram заменён заглушками
+из tg_stubs.py. Для каждого сценария берётся медиана из --repeat прогонов после прогрева.
+С --baseline сценарий считается регрессией, если медиана выросла больше порога
+(THRESHOLDS или --threshold) и больше чем на --min-delta-ms; тогда код выхода 1.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import datagen
+import tg_stubs
+from _bootstrap import REPO_ROOT, import_main
+
+INVOCATION_DIR = os.getcwd()
+workdir = tempfile.mkdtemp(prefix="cxner-bench-suite-")
+main = import_main(workdir)
+
+DEFAULT_THRESHOLD = 0.20
+# Запись на диск шумит сильнее чистого CPU — даём больший допуск.
+THRESHOLDS = {
+    "save_db": 0.35,
+    "export_webapp_releases": 0.30,
+    "upload_reminders": 0.35,
+}
+
+
+def _invalid_webapp_payload() -> str:
+    # Все поля валидны, кроме даты в прошлом: handler проходит всю валидацию и отвечает списком ошибок.
+    return json.dumps({
+        "action": "webapp_release_submit",
+        "submitted_at": "2025-01-01T12:00:00",
+        "form": {
+            "type": "альбом",
+            "name": "Lost in the Void",
+            "subname": ".",
+            "has_lyrics": "да",
+            "nick": "bench",
+            "fio": "Иванов Иван Иванович",
+            "date": "01.01.2020",
+            "version": "Оригинал",
+            "genre": "phonk",
+            "link": "https://drive.google.com/drive/folders/bench",
+            "yandex": ".",
+            "mat": "нет",
+            "promo": ".",
+            "comment": ".",
+            "tracklist": "1. Intro\n2. Outro",
+            "tg": "@bench",
+        },
+    }, ensure_ascii=False)
+
+
+def build_cases(data: dict):
+    """Returns [(name, sync_or_async_callable)] bound to the currently loaded stores."""
+    bot = tg_stubs.StubBot()
+    admin_id = main.ADMIN_IDS[0]
+    heavy_uid = datagen.heaviest_user(main.db)
+    heavy_nick = main.db[heavy_uid][0]["nick"]
+    payload = _invalid_webapp_payload()
+
+    async def admin_panel():
+        await main.admin_panel(tg_stubs.message_update(bot, admin_id), tg_stubs.context(bot))
+
+    async def my_cmd():
+        await main.my_cmd(tg_stubs.message_update(bot, int(heavy_uid)), tg_stubs.context(bot))
+
+    async def my_cmd_page():
+        update = tg_stubs.callback_update(bot, "card_5", int(heavy_uid))
+        await main.my_cmd(update, tg_stubs.context(bot), page=5)
+
+    async def search_cmd():
+        await main.search_cmd(tg_stubs.message_update(bot, int(heavy_uid)), tg_stubs.context(bot, [heavy_nick[:4]]))
+
+    async def upload_reminders():
+        await main._check_on_upload_reminders(tg_stubs.context(bot))
+
+    async def webapp_validation():
+        update = tg_stubs.message_update(bot, int(heavy_uid), web_app_data=payload)
+        await main.web_app_data_handler(update, tg_stubs.context(bot))
+
+    return bot, [
+        ("save_db", lambda: main.save_db(main.db)),
+        ("export_webapp_releases", lambda: main._export_webapp_releases(main.db)),
+        ("admin_panel_stats", admin_panel),
+        ("admin_stats_page_first", lambda: main._render_admin_stats_page(0)),
+        ("admin_stats_page_last", lambda: main._render_admin_stats_page(10 ** 9)),
+        ("my_cmd", my_cmd),
+        ("my_cmd_page", my_cmd_page),
+        ("search_cmd", search_cmd),
+        ("upload_reminders", upload_reminders),
+        ("webapp_validation", webapp_validation),
+    ]
+
+
+def time_case(fn, repeat: int) -> dict:
+    loop = asyncio.new_event_loop()
+    try:
+        def once():
+            result = fn()
+            if asyncio.iscoroutine(result):
+                loop.run_until_complete(result)
+
+        samples = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            once()  # прогрев: кэши рендера, первая отправка напоминаний
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                once()
+                samples.append((time.perf_counter() - t0) * 1000)
+    finally:
+        loop.close()
+    return {
+        "median_ms": round(statistics.median(samples), 4),
+        "min_ms": round(min(samples), 4),
+        "max_ms": round(max(samples), 4),
+        "runs": repeat,
+    }
+
+
+def run_scale(releases: int, seed: int, repeat: int, only: set[str] | None) -> dict:
+    data = datagen.generate(releases, seed)
+    datagen.write(workdir, data, main)
+    main.load_stores()
+    bot, cases = build_cases(data)
+    results = {}
+    for name, fn in cases:
+        if only and name not in only:
+            continue
+        results[name] = time_case(fn, repeat)
+        print(f"  {name:<26}{results[name]['median_ms']:>12.3f} ms", flush=True)
+    assert bot.calls, "stubbed handlers did not reach the Bot API"
+    return results
+
+
+def _git_commit() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True)
+        return out.stdout.strip() or "unknown"
+    except OSError:
+        return "unknown"
+
+
+def compare(report: dict, baseline: dict, threshold: float, min_delta_ms: float) -> list[str]:
+    regressions = []
+    print(f"\n{'scale':>8}  {'case':<26}{'baseline':>12}{'current':>12}{'ratio':>8}")
+    for scale, cases in report["results"].items():
+        base_cases = baseline.get("results", {}).get(scale, {})
+        for name, res in cases.items():
+            base = base_cases.get(name)
+            if not base:
+                continue
+            ratio = res["median_ms"] / base["median_ms"] if base["median_ms"] else float("inf")
+            limit = THRESHOLDS.get(name, threshold)
+            flag = ""
+            if ratio > 1 + limit and res["median_ms"] - base["median_ms"] > min_delta_ms:
+                flag = "  REGRESSION"
+                regressions.append(f"{scale}/{name}: {base['median_ms']:.3f} -> {res['median_ms']:.3f} ms (x{ratio:.2f}, limit x{1 + limit:.2f})")
+            print(f"{scale:>8}  {name:<26}{base['median_ms']:>12.3f}{res['median_ms']:>12.3f}{ratio:>8.2f}{flag}")
+    return regressions
+
+
+def main_cli():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--scales", default="1000,10000", help="comma-separated release counts (1k..200k)")
+    ap.add_argument("--seed", type=int, default=1234)
+    ap.add_argument("--repeat", type=int, default=7)
+    ap.add_argument("--only", default="", help="comma-separated case names")
+    ap.add_argument("--output", help="write the JSON report here")
+    ap.add_argument("--baseline", help="JSON report to compare against")
+    ap.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="allowed relative slowdown")
+    ap.add_argument("--min-delta-ms", type=float, default=0.05, help="ignore slowdowns below this absolute delta")
+    args = ap.parse_args()
+
+    scales = [int(s) for s in args.scales.split(",") if s.strip()]
+    only = {s.strip() for s in args.only.split(",") if s.strip()} or None
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "seed": args.seed,
+            "repeat": args.repeat,
+        },
+        "results": {},
+    }
+    for releases in scales:
+        print(f"releases={releases}", flush=True)
+        report["results"][str(releases)] = run_scale(releases, args.seed, args.repeat, only)
+
+    if args.output:
+        with open(os.path.join(INVOCATION_DIR, args.output), "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(os.path.join(INVOCATION_DIR, args.baseline), encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold, args.min_delta_ms)
+        if regressions:
+            print("\nregressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print("\nno regressions")
+
+
+if __name__ == "__main__":
+    main_cli()
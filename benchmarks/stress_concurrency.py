@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""Stress check for concurrent update processing: no lost submissions, no index collisions.
+
+Запуск:
+    python benchmarks/stress_concurrency.py [--users 50] [--submissions 4] [--clicks 400]
+    python benchmarks/stress_concurrency.py --no-locks   # то же без блокировок — должно упасть
+
+Апдейты идут через UserSerializedUpdateProcessor, как в боте с UPDATE_CONCURRENCY > 1, а
+Bot API заменён заглушкой со случайной задержкой, чтобы корутины перемешивались на каждом await.
+Сценарий: каждый из --users артистов одновременно шлёт --submissions анкет Mini App, затем
+--moderators модераторов параллельно жмут кнопки статусов по случайным релизам. Проверяется:
+    * у каждого артиста ровно --submissions релизов;
+    * пары (user_id, idx) в клавиатурах карточек уникальны и указывают на свою карточку;
+    * история статусов каждого релиза — непрерывная цепочка, а итоговая правка карточки
+      соответствует статусу в базе.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import tg_stubs
+from _bootstrap import import_main
+
+workdir = tempfile.mkdtemp(prefix="cxner-bench-stress-")
+main = import_main(workdir)
+
+TRANSITIONS = ("upload", "moderate", "approve")
+ARTIST_BASE_ID = 900000000
+MODERATOR_BASE_ID = 500000000
+
+
+class JitterBot(tg_stubs.StubBot):
+    """StubBot that sleeps a random time in every call and remembers returned message ids."""
+
+    def __init__(self, rnd: random.Random, max_delay_ms: float):
+        super().__init__()
+        self._rnd = rnd
+        self._max_delay = max_delay_ms / 1000
+
+    async def _sleep(self):
+        await asyncio.sleep(self._rnd.uniform(0, self._max_delay))
+
+    def _record(self, method: str, **kwargs):
+        message = super()._record(method, **kwargs)
+        self.calls[-1][1]["_message_id"] = message.message_id
+        return message
+
+    async def send_message(self, *args, **kwargs):
+        await self._sleep()
+        return await super().send_message(*args, **kwargs)
+
+    async def edit_message_text(self, *args, **kwargs):
+        await self._sleep()
+        return await super().edit_message_text(*args, **kwargs)
+
+    async def edit_message_reply_markup(self, *args, **kwargs):
+        await self._sleep()
+        return await super().edit_message_reply_markup(*args, **kwargs)
+
+    async def pin_chat_message(self, *args, **kwargs):
+        await self._sleep()
+        return await super().pin_chat_message(*args, **kwargs)
+
+    async def answer_callback_query(self, *args, **kwargs):
+        await self._sleep()
+        return await super().answer_callback_query(*args, **kwargs)
+
+
+def payload(artist: int, n: int) -> str:
+    return json.dumps({
+        "action": "webapp_release_submit",
+        "submitted_at": datetime.now().isoformat(),
+        "form": {
+            "type": "single",
+            "name": f"Stress {artist}-{n}",
+            "subname": ".",
+            "has_lyrics": "yes",
+            "nick": f"stress_{artist}",
+            "fio": "Stress Test",
+            "date": (datetime.now() + timedelta(days=14)).strftime("%d.%m.%Y"),
+            "version": "-",
+            "genre": "phonk",
+            "link": f"https://example.org/{artist}/{n}",
+            "yandex": ".",
+            "mat": "no",
+            "promo": ".",
+            "comment": ".",
+            "tg": f"@stress_{artist}",
+        },
+    })
+
+
+class NoLocks(main.KeyedLocks):
+    __slots__ = ()
+
+    @contextlib.asynccontextmanager
+    async def hold(self, key):
+        yield
+
+
+def disable_locks() -> None:
+    main.USER_LOCKS = NoLocks("user")
+    main.RELEASE_LOCKS = NoLocks("release")
+
+
+class CardTracker:
+    """Maps moderation card message ids to the (user_id, idx) in their keyboard."""
+
+    def __init__(self, bot: JitterBot):
+        self.bot = bot
+
+    def cards(self) -> dict[int, tuple[str, int]]:
+        out = {}
+        for method, kwargs in self.bot.calls:
+            markup = kwargs.get("reply_markup")
+            if method != "sendMessage" or kwargs.get("chat_id") != main.MODERATION_CHAT_ID or markup is None:
+                continue
+            for row in markup.inline_keyboard:
+                for button in row:
+                    if (button.callback_data or "").startswith("m_approve_"):
+                        user_id, idx = button.callback_data[len("m_approve_"):].rsplit("_", 1)
+                        out[kwargs["_message_id"]] = (user_id, int(idx))
+        return out
+
+
+async def run(args) -> list[str]:
+    rnd = random.Random(args.seed)
+    bot = JitterBot(rnd, args.max_delay_ms)
+    processor = main.UserSerializedUpdateProcessor(args.concurrency)
+
+    def submit(artist: int, n: int):
+        update = tg_stubs.message_update(bot, artist, web_app_data=payload(artist, n))
+        return processor.process_update(update, main.web_app_data_handler(update, tg_stubs.context(bot)))
+
+    artists = [ARTIST_BASE_ID + u for u in range(args.users)]
+    order = [(a, n) for n in range(args.submissions) for a in artists]
+    rnd.shuffle(order)
+    t0 = time.perf_counter()
+    await asyncio.gather(*(submit(a, n) for a, n in order))
+    submit_time = time.perf_counter() - t0
+
+    tracker = CardTracker(bot)
+    cards = tracker.cards()
+    card_of = {}
+    for message_id, key in cards.items():
+        card_of[key] = message_id
+
+    clicks = []
+    for _ in range(args.clicks):
+        user_id, idx = rnd.choice(list(cards.values()))
+        moderator = MODERATOR_BASE_ID + rnd.randrange(args.moderators)
+        update = tg_stubs.callback_update(bot, f"m_{rnd.choice(TRANSITIONS)}_{user_id}_{idx}", moderator, main.MODERATION_CHAT_ID)
+        # карточка, на которой нажата кнопка, — та, что в базе у релиза
+        update.callback_query.message.message_id = card_of[(user_id, idx)]
+        clicks.append(processor.process_update(update, main.CALLBACK_ROUTER.dispatch(update, tg_stubs.context(bot))))
+    t0 = time.perf_counter()
+    await asyncio.gather(*clicks)
+    click_time = time.perf_counter() - t0
+    # хвостовые правки карточек уходят после окна коалесинга, уже без хендлера
+    await main.MODERATION_CARDS.flush()
+
+    problems = []
+    total = sum(len(main.db.get(str(a), [])) for a in artists)
+    for a in artists:
+        got = len(main.db.get(str(a), []))
+        if got != args.submissions:
+            problems.append(f"user {a}: {got} releases stored, expected {args.submissions}")
+    keys = list(cards.values())
+    if len(keys) != len(set(keys)):
+        problems.append(f"index collisions: {len(keys) - len(set(keys))} cards share a (user_id, idx)")
+    for message_id, (user_id, idx) in cards.items():
+        releases = main.db.get(user_id, [])
+        if idx >= len(releases) or releases[idx].get("moderation_message_id") != message_id:
+            problems.append(f"card {message_id} points to {user_id}/{idx}, which belongs to another card")
+
+    history = main.load_history()
+    last_edit = {}
+    for method, kwargs in bot.calls:
+        if method == "editMessageText" and kwargs.get("chat_id") == main.MODERATION_CHAT_ID:
+            last_edit[kwargs.get("message_id")] = kwargs.get("text") or ""
+    for (user_id, idx), message_id in card_of.items():
+        releases = main.db.get(user_id, [])
+        if idx >= len(releases):
+            continue
+        entries = history.get(f"{user_id}_{idx}", [])
+        for prev, cur in zip(entries, entries[1:]):
+            if cur.get("old_status") != prev.get("new_status"):
+                problems.append(f"{user_id}/{idx}: history chain broken ({prev.get('new_status')} -> {cur.get('old_status')})")
+                break
+        status = releases[idx].get("status")
+        if entries and entries[-1].get("new_status") != status:
+            problems.append(f"{user_id}/{idx}: last history entry {entries[-1].get('new_status')} != stored {status}")
+        if entries and not last_edit.get(message_id, "").startswith(main._status_header(status)):
+            problems.append(f"{user_id}/{idx}: moderation card shows a stale status (stored {status})")
+
+    print(f"submissions: {total}/{args.users * args.submissions} stored in {submit_time * 1000:.0f} ms")
+    print(f"clicks: {args.clicks} by {args.moderators} moderators in {click_time * 1000:.0f} ms")
+    for scope in ("user", "release"):
+        hist = main.METRICS.histogram("bot_lock_wait_seconds", scope=scope)
+        contended = main.METRICS.counter("bot_lock_contended_total", scope=scope).value
+        print(f"lock[{scope}]: acquisitions={hist.count} contended={contended} mean_wait={hist.total / max(1, hist.count) * 1000:.1f} ms p95<={hist.quantile(0.95) * 1000:.0f} ms")
+    return problems
+
+
+def main_cli():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--users", type=int, default=50)
+    ap.add_argument("--submissions", type=int, default=4, help="concurrent submissions per user")
+    ap.add_argument("--moderators", type=int, default=5)
+    ap.add_argument("--clicks", type=int, default=400)
+    ap.add_argument("--concurrency", type=int, default=32, help="UPDATE_CONCURRENCY")
+    ap.add_argument("--max-delay-ms", type=float, default=20.0, help="max simulated Bot API latency")
+    ap.add_argument("--seed", type=int, default=1234)
+    ap.add_argument("--no-locks", action="store_true", help="disable the locks to show what they prevent")
+    args = ap.parse_args()
+
+    if args.no_locks:
+        disable_locks()
+    main.load_stores()
+    with contextlib.redirect_stdout(io.StringIO()) as handler_log:
+        problems = asyncio.run(run(args))
+    # итоги печатались под redirect — выводим только их, без логов хендлеров
+    print("\n".join(line for line in handler_log.getvalue().splitlines() if line.startswith(("submissions:", "clicks:", "lock["))))
+    if problems:
+        print(f"FAILED: {len(problems)} problems")
+        for p in problems[:20]:
+            print(f"  {p}")
+        sys.exit(1)
+    print("OK: no lost updates, no index collisions, cards match stored statuses")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""In-process stand-ins for the PTB objects handlers touch, so benchmarks never hit the network.
+
+Заглушки реализуют ровно те атрибуты и корутины, которые вызывает main.py, и
+записывают вызовы Bot API — по ним бенчмарк проверяет, что сценарий действительно отработал.
+"""
+import asyncio
+import itertools
+from types import SimpleNamespace
+
+_message_ids = itertools.count(10_000)
+
+
+class StubBot:
+    def __init__(self):
+        self.calls: list[tuple[str, dict]] = []
+
+    def _record(self, method: str, **kwargs):
+        self.calls.append((method, kwargs))
+        return StubMessage(self, chat_id=kwargs.get("chat_id", 0))
+
+    async def send_message(self, chat_id=None, text=None, **kwargs):
+        return self._record("sendMessage", chat_id=chat_id, text=text, **kwargs)
+
+    async def edit_message_text(self, text=None, chat_id=None, message_id=None, **kwargs):
+        return self._record("editMessageText", chat_id=chat_id, message_id=message_id, text=text, **kwargs)
+
+    async def edit_message_reply_markup(self, chat_id=None, message_id=None, **kwargs):
+        return self._record("editMessageReplyMarkup", chat_id=chat_id, message_id=message_id, **kwargs)
+
+    async def pin_chat_message(self, chat_id=None, message_id=None, **kwargs):
+        self.calls.append(("pinChatMessage", {"chat_id": chat_id, "message_id": message_id}))
+        return True
+
+    async def send_document(self, chat_id=None, document=None, **kwargs):
+        return self._record("sendDocument", chat_id=chat_id, **kwargs)
+
+    async def send_photo(self, chat_id=None, photo=None, **kwargs):
+        return self._record("sendPhoto", chat_id=chat_id, **kwargs)
+
+    async def answer_callback_query(self, *args, **kwargs):
+        self.calls.append(("answerCallbackQuery", kwargs))
+        return True
+
+
+class StubMessage:
+    def __init__(self, bot: StubBot, chat_id: int = 0, user_id: int = 0, text: str = "", web_app_data: str | None = None):
+        self._bot = bot
+        self.message_id = next(_message_ids)
+        self.chat_id = chat_id
+        self.chat = SimpleNamespace(id=chat_id, type="private")
+        self.from_user = SimpleNamespace(id=user_id, username=f"user{user_id}", first_name="Bench", last_name=None)
+        self.text = text
+        self.reply_markup = None
+        self.reply_to_message = None
+        self.web_app_data = SimpleNamespace(data=web_app_data) if web_app_data is not None else None
+
+    async def reply_text(self, text, **kwargs):
+        return self._bot._record("sendMessage", chat_id=self.chat_id, text=text, **kwargs)
+
+    async def edit_text(self, text, **kwargs):
+        return self._bot._record("editMessageText", chat_id=self.chat_id, message_id=self.message_id, text=text, **kwargs)
+
+
+class StubCallbackQuery:
+    def __init__(self, bot: StubBot, data: str, user_id: int, chat_id: int):
+        self._bot = bot
+        self.data = data
+        self.from_user = SimpleNamespace(id=user_id, username=f"user{user_id}", first_name="Bench")
+        self.message = StubMessage(bot, chat_id=chat_id, user_id=user_id)
+
+    async def answer(self, text=None, show_alert=False, **kwargs):
+        return await self._bot.answer_callback_query(text=text, show_alert=show_alert)
+
+    async def edit_message_text(self, text, **kwargs):
+        return self._bot._record("editMessageText", chat_id=self.message.chat_id, message_id=self.message.message_id, text=text, **kwargs)
+
+    async def edit_message_reply_markup(self, reply_markup=None, **kwargs):
+        return self._bot._record("editMessageReplyMarkup", chat_id=self.message.chat_id, message_id=self.message.message_id)
+
+
+def message_update(bot: StubBot, user_id: int, text: str = "", chat_id: int | None = None, web_app_data: str | None = None):
+    message = StubMessage(bot, chat_id=user_id if chat_id is None else chat_id, user_id=user_id, text=text, web_app_data=web_app_data)
+    return SimpleNamespace(
+        message=message,
+        callback_query=None,
+        effective_user=message.from_user,
+        effective_chat=message.chat,
+        effective_message=message,
+    )
+
+
+def callback_update(bot: StubBot, data: str, user_id: int, chat_id: int | None = None):
+    query = StubCallbackQuery(bot, data, user_id, user_id if chat_id is None else chat_id)
+    return SimpleNamespace(
+        message=None,
+        callback_query=query,
+        effective_user=query.from_user,
+        effective_chat=query.message.chat,
+        effective_message=query.message,
+    )
+
+
+class StubApplication:
+    """Runs tasks handlers hand to context.application.create_task on the current loop."""
+
+    def __init__(self):
+        self.tasks: set[asyncio.Task] = set()
+
+    def create_task(self, coroutine, update=None, *, name=None):
+        task = asyncio.get_running_loop().create_task(coroutine, name=name)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def drain(self) -> None:
+        while self.tasks:
+            await asyncio.gather(*self.tasks)
+
+
+def context(bot: StubBot, args: list[str] | None = None, application: StubApplication | None = None):
+    return SimpleNamespace(bot=bot, args=args or [], user_data={}, chat_data={}, bot_data={}, application=application or StubApplication(), job=None)